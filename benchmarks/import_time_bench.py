@@ -0,0 +1,88 @@
+"""
+Import time of the ADK agent modules, measured with `python -X importtime`.
+
+    python benchmarks/import_time_bench.py
+    python benchmarks/import_time_bench.py codeagent.agent marialuisa.agent --top 15
+    python benchmarks/import_time_bench.py --preload "" --budget-ms 2500
+
+Each module is imported in a fresh interpreter with src/agents on sys.path.
+`adk web` / `adk run` have already imported google.adk.agents when they load
+an agent, so by default it is preloaded and only the time the agent module
+adds on top is measured; its own import time is printed for reference. Exits
+with status 1 if any module is over budget.
+
+The default budget of 100ms was set from measurements on a 4-core Linux VM
+(google-adk 1.19.0, Python 3.11). On top of a preloaded google.adk.agents,
+the agents took 3-15ms with lazy loading, against 3100-3900ms for
+marialuisa, eugenio and codeagent before it, which imported litellm eagerly.
+google.adk.agents itself took about 1450-1620ms. Pass --preload "" to
+measure cold imports.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+from typing import List, Tuple
+
+AGENTS_DIR = Path(__file__).parent.parent / "src" / "agents"
+IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_times(module: str, preload: str = "") -> Tuple[float, List[Tuple[float, str]]]:
+    """
+    Import time of module in ms, after `preload` has been imported, and the
+    cumulative time of each of its direct imports
+    """
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([str(AGENTS_DIR), os.environ.get("PYTHONPATH", "")])}
+    code = f"import {preload}; import {module}" if preload else f"import {module}"
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        env=env,
+        cwd=AGENTS_DIR,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{completed.stderr[-2000:]}")
+
+    entries = []
+    for line in completed.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            entries.append((len(match.group(3)), int(match.group(2)) / 1000, match.group(4)))
+
+    # Imports are printed after everything they imported, indented one level deeper (2 spaces).
+    # The deepest entry for `module` is the one whose body ran; its direct imports precede it.
+    total = max(ms for depth, ms, name in entries if depth == 1 and name == module)
+    body = max((i for i, (_, _, name) in enumerate(entries) if name == module), key=lambda i: entries[i][0])
+    direct = []
+    for depth, ms, name in reversed(entries[:body]):
+        if depth <= entries[body][0]:
+            break
+        if depth == entries[body][0] + 2:
+            direct.append((ms, name))
+    return total, sorted(direct, reverse=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=["codeagent.agent", "marialuisa.agent", "eugenio.agent", "walter.agent"])
+    parser.add_argument("--budget-ms", type=float, default=100.0)
+    parser.add_argument("--preload", default="google.adk.agents", help='imported before each module ("" for none)')
+    parser.add_argument("--top", type=int, default=8)
+    args = parser.parse_args()
+
+    if args.preload:
+        preload_ms, _ = import_times(args.preload)
+        print(f"{args.preload:<20} {preload_ms:8.1f}ms  (preloaded, not counted)")
+    over_budget = False
+    for module in args.modules:
+        total, dependencies = import_times(module, args.preload)
+        status = "ok" if total <= args.budget_ms else "OVER BUDGET"
+        over_budget |= total > args.budget_ms
+        print(f"{module:<20} {total:8.1f}ms  (budget {args.budget_ms:.0f}ms) {status}")
+        for ms, name in dependencies[:args.top]:
+            print(f"    {ms:8.1f}ms  {name}")
+    sys.exit(1 if over_budget else 0)
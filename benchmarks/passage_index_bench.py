@@ -0,0 +1,69 @@
+"""
+Query latency of tools.passage_index.PassageIndex on synthetic corpora.
+
+    python benchmarks/passage_index_bench.py --sizes 100000 1000000
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from tools.passage_index import PassageIndex
+
+
+class SyntheticPassage:
+    def __init__(self, id: str, source_id: str, content: str):
+        self.id = id
+        self.source_id = source_id
+        self.content = content
+
+
+def synthetic_passages(count: int, vocabulary: int = 50_000, length: int = 120, seed: int = 0):
+    """Passages whose words follow a Zipf distribution, like natural text"""
+    rng = np.random.default_rng(seed)
+    for i in range(count):
+        ids = np.minimum(rng.zipf(1.2, size=length), vocabulary)
+        yield SyntheticPassage(f"src{i // 20}_chunk_{i % 20}", f"src{i // 20}", " ".join(f"term{w}" for w in ids))
+
+
+def run(size: int, queries: int, top_k: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        index = PassageIndex(directory)
+        start = time.perf_counter()
+        index.add(synthetic_passages(size))
+        index.compact()
+        build = time.perf_counter() - start
+
+        rng = np.random.default_rng(1)
+        latencies = []
+        for _ in range(queries):
+            words = rng.integers(1, 2_000, size=3)
+            query = " ".join(f"term{w}" for w in words)
+            start = time.perf_counter()
+            index.search(query, top_k=top_k)
+            latencies.append((time.perf_counter() - start) * 1000)
+        index.close()
+
+    latencies.sort()
+    print(
+        f"{size:>9} passages | build {build:7.1f}s | "
+        f"p50 {statistics.median(latencies):7.2f}ms | "
+        f"p95 {latencies[int(len(latencies) * 0.95) - 1]:7.2f}ms | "
+        f"max {latencies[-1]:7.2f}ms"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+    for size in args.sizes:
+        run(size, args.queries, args.top_k)
@@ -0,0 +1,121 @@
+"""
+Lazy loading of agents and model clients.
+
+`adk web` / `adk run` import every agent package up front. Agents here are
+declared by module name and imported on first use, and LiteLLM models are
+wrapped so `litellm` is only imported when the agent first calls its model;
+Gemini models are wrapped the same way.
+"""
+import importlib
+import sys
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, AsyncGenerator, Callable, Dict, List, Optional
+
+from pydantic import PrivateAttr
+from typing_extensions import override
+
+from google.adk.agents import BaseAgent, SequentialAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+
+# `tools` lives next to the agents directory, which is the only one ADK puts on sys.path
+TOOLS_PATH = str(Path(__file__).parent.parent)
+if TOOLS_PATH not in sys.path:
+    sys.path.append(TOOLS_PATH)
+
+AGENT_MODULES = {
+    "marialuisa": "marialuisa.agent",
+    "eugenio": "eugenio.agent",
+    "walter": "walter.agent",
+    "gepeto": "gepeto.agent",
+    "debora": "debora.agent",
+}
+
+
+@lru_cache(maxsize=None)
+def load_agent(name: str) -> BaseAgent:
+    """root_agent of a registered agent, importing its module the first time"""
+    if name not in AGENT_MODULES:
+        raise KeyError(f"Unknown agent {name!r}, expected one of {sorted(AGENT_MODULES)}")
+    return importlib.import_module(AGENT_MODULES[name]).root_agent
+
+
+class LazyLlm(BaseLlm):
+    """BaseLlm that builds the real client with `factory` on its first request"""
+
+    factory: Callable[[], BaseLlm]
+    _llm: BaseLlm | None = PrivateAttr(default=None)
+
+    def resolve(self) -> BaseLlm:
+        if self._llm is None:
+            self._llm = self.factory()
+        return self._llm
+
+    @override
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        async for response in self.resolve().generate_content_async(llm_request, stream=stream):
+            yield response
+
+    @override
+    def connect(self, llm_request: LlmRequest):
+        return self.resolve().connect(llm_request)
+
+
+def lazy_litellm(model: str, **kwargs) -> LazyLlm:
+    """LiteLlm(model=...) that imports litellm only when first called"""
+
+    def build() -> BaseLlm:
+        from google.adk.models.lite_llm import LiteLlm
+
+        return LiteLlm(model=model, **kwargs)
+
+    return LazyLlm(model=model, factory=build)
+
+
+def lazy_gemini(model: str, retry_options: Optional[Dict[str, Any]] = None, **kwargs) -> LazyLlm:
+    """Gemini(model=..., retry_options=HttpRetryOptions(**retry_options)) built on its first call"""
+
+    def build() -> BaseLlm:
+        from google.adk.models.google_llm import Gemini
+        from google.genai import types
+
+        if retry_options is not None:
+            kwargs["retry_options"] = types.HttpRetryOptions(**retry_options)
+        return Gemini(model=model, **kwargs)
+
+    return LazyLlm(model=model, factory=build)
+
+
+class LazySequentialAgent(SequentialAgent):
+    """SequentialAgent whose sub-agents are named in `agent_names` and loaded on the first run"""
+
+    agent_names: List[str]
+
+    def resolve(self) -> None:
+        if self.sub_agents:
+            return
+        for name in self.agent_names:
+            agent = load_agent(name)
+            agent.parent_agent = self
+            self.sub_agents.append(agent)
+
+    @override
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        self.resolve()
+        async for event in super()._run_async_impl(ctx):
+            yield event
+
+    @override
+    async def _run_live_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        self.resolve()
+        async for event in super()._run_live_impl(ctx):
+            yield event
+
+    @override
+    def find_sub_agent(self, name: str):
+        self.resolve()
+        return super().find_sub_agent(name)
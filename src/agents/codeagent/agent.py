@@ -1,16 +1,26 @@
-from google.adk.agents import SequentialAgent
-from marialuisa.agent import root_agent as marialuisa_agent
-from eugenio.agent import root_agent as eugenio_agent
-from walter.agent import root_agent as walter_agent
+from agent_registry import LazySequentialAgent
 
-code_pipeline_agent = SequentialAgent(
+code_pipeline_agent = LazySequentialAgent(
     name="CodePipelineAgent",
-    sub_agents=[
-        marialuisa_agent,
-        eugenio_agent,
-        walter_agent,
+    # Loaded on the first run, so starting `adk web` does not import every agent
+    agent_names=[
+        "marialuisa",
+        "eugenio",
+        "walter",
     ],
     description="""An orchestrator agent that coordinates the planning, building, and testing of deep learning models based on user specifications.""",
 )
 
-root_agent = code_pipeline_agent
\ No newline at end of file
+root_agent = code_pipeline_agent
+
+
+def __getattr__(name: str):
+    # `app` is built when ADK first asks for it, so importing this module stays cheap
+    if name == "app":
+        from google.adk.apps import App
+        from tools.prompt_cache import gemini_context_cache_config
+
+        # Gemini context caching for walter's static prompt when it runs inside the pipeline
+        globals()["app"] = App(name="codeagent", root_agent=root_agent, context_cache_config=gemini_context_cache_config())
+        return globals()["app"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,14 +1,12 @@
 from google.adk.agents.llm_agent import Agent
-from google.adk.models.google_llm import Gemini
-from google.adk.models.lite_llm import LiteLlm
-from google.genai import types
-import sys
-from pathlib import Path
+from google.adk.agents.readonly_context import ReadonlyContext
 
-tools_path = Path(__file__).parent.parent.parent 
-sys.path.append(str(tools_path))
-
-from tools.code import execute_script, send_to_env
+from agent_registry import lazy_litellm
+from tools.blueprint import blueprint_from_state
+from tools.code import evaluate_candidates, execute_script, send_to_env, send_to_env_streaming
+from tools.shape_check import ShapeError, check_blueprint_shapes, check_shapes
+from tools.llm_cache import llm_cache_callbacks
+from tools.prompt_cache import ollama_cache_options
 
 PROMPT_TEMPLATE = """
 YOU ARE "PYTORCH-IMPLEMENTER-PRO", A SENIOR ML ENGINEER SPECIALIZED IN PRODUCTION-GRADE PYTORCH CODE.
@@ -22,7 +20,7 @@ YOU DO NOT QUESTION THE ARCHITECTURE DESIGN (unless it contains a fatal dimensio
 ### CORE BEHAVIOR
 
 1. **PARSE**: Read the provided JSON Blueprint. Extract input shapes, layer definitions, and loss functions.
-2. **VALIDATE**: Mentally check if the specified layers match the input/output dimensions. If there is a mismatch (e.g., Flattening a 7x7x64 tensor into a Linear layer with wrong input dim), YOU MUST FIX THE DIMENSION CALCULATION AUTOMATICALLY.
+2. **VALIDATE**: Read the `### SHAPE CHECK` at the end of these instructions: it traces the declared layers locally and lists any dimension errors. Check mentally only the layers it could not parse. If there is a mismatch (e.g., Flattening a 7x7x64 tensor into a Linear layer with wrong input dim), YOU MUST FIX THE DIMENSION CALCULATION AUTOMATICALLY.
 3. **CODE**: Generate the full Python script.
 
 ======================================================================
@@ -95,26 +93,54 @@ class CustomModel(nn.Module):
   - **Dimension Mismatch**: If the Architect's blueprint implies a connection that fails (e.g., Linear layer input size doesn't match the flattened Conv output), calculate the correct size dynamically or use a dummy pass in `__init__` to auto-detect size.
   - **Missing Hyperparams**: If the Architect forgot the Learning Rate, default to `1e-3` (Adam) or `1e-2` (SGD).
 
+### BEFORE SENDING CODE
+- if you change the layer structure of the blueprint, re-check it with `check_blueprint_shapes(blueprint)` (instant, no remote run) before sending the code.
+
 ### WHEN YPU FINISH
 - when you finish you will send the code to a remote environment for testing and then execute it:
   - use `send_to_env(content: str)` to send the code. then
   - use `execute_remote_command()` to run the code and get output. and finally
   - generate a summary of the results in naturual language
+- for long training runs use `send_to_env_streaming(content: str)` instead: it sends and runs the code in one call,
+  stops as soon as a traceback is printed and returns only the tail of the output
+- if you are unsure between several implementations or hyperparameters, do not try them one by one:
+  - use `evaluate_candidates(candidates: list[str])` to run all the implementations at once, or
+  - use `evaluate_candidates([code], hyperparameters=[{...}, ...])` with a script that reads `HPARAMS.get("lr", 1e-3)`
+  - keep the best ranked result (first in the list) and fix the others only if needed
 
 YOU ARE THE BUILDER. MAKE IT RUN.
 """
 
+def blueprint_instruction(context: ReadonlyContext) -> str:
+  """
+  Local shape check of the blueprint marialuisa left in session state. The
+  blueprint itself is not repeated: it already arrives as marialuisa's reply,
+  the current turn that include_contents="none" still sends. A blueprint that
+  cannot be read must not take the turn down with it.
+  """
+  try:
+    blueprint = blueprint_from_state(context.state)
+    report = check_shapes(blueprint) if blueprint is not None else None
+  except (ValueError, ShapeError) as exc:
+    return f"No blueprint was provided; implement the user's request directly. (Blueprint could not be checked: {exc})"
+  if report is None:
+    return "No blueprint was provided; implement the user's request directly."
+  lines = [f"{step['layer']} -> {step['shape']}" for step in report["trace"]]
+  lines += [f"ERROR: {error}" for error in report["errors"]]
+  lines += [f"WARNING: {warning}" for warning in report["warnings"]]
+  return "### SHAPE CHECK\n" + "\n".join(lines)
+
+
 root_agent = Agent(
-#     model=Gemini(
-#       model='gemini-2.0-flash-lite',
-#       retry_options=types.HttpRetryOptions(
-#         initial_delay=1,
-#         attempts=2
-#       )
-#     ),
-  model=LiteLlm(model="ollama_chat/gpt-oss:20b"),
+#     model=lazy_gemini('gemini-2.0-flash-lite', retry_options={"initial_delay": 1, "attempts": 2}),
+  model=lazy_litellm("ollama_chat/gpt-oss:20b", **ollama_cache_options()),
   name='eugenio',
   description='You are an expert reasearcher scientist who helps users create high quality AI/ML models',
-  instruction=PROMPT_TEMPLATE,
-  tools=[send_to_env, execute_script],
+  # Sent verbatim and first, so Ollama can reuse its cached prefix
+  static_instruction=PROMPT_TEMPLATE,
+  instruction=blueprint_instruction,
+  # Only the current turn (marialuisa's blueprint) is sent, not the earlier conversation
+  include_contents="none",
+  tools=[send_to_env, send_to_env_streaming, execute_script, evaluate_candidates, check_blueprint_shapes],
+  **llm_cache_callbacks(),
 )
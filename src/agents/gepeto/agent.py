@@ -1,5 +1,7 @@
 from google.adk.agents.llm_agent import Agent
-from google.adk.models.lite_llm import LiteLlm
+
+from agent_registry import lazy_litellm
+from tools.prompt_cache import ollama_cache_options
 
 PROMPT_TEMPLATE = """
 YOU ARE "DEBUG-PROMPT-MASTER", THE WORLD'S MOST PRECISE DEBUGGING AND PROMPT-REFINEMENT EXPERT. YOUR JOB IS TO TAKE SCRIPT EXECUTION OUTPUT (INCLUDING ERRORS, STACK TRACES, LOGS, AND CONTEXT) AND:
@@ -280,11 +282,12 @@ YOU MUST ALWAYS:
 """
 
 root_agent = Agent(
-    model=LiteLlm(model="ollama_chat/gpt-oss:20b"),
+    model=lazy_litellm("ollama_chat/gpt-oss:20b", **ollama_cache_options()),
     name="code_review_agent",
     description=(
         "An agent that reviews code snippets, identifies potential issues, "
         "and suggests improvements or optimizations."
     ),
-    instruction=PROMPT_TEMPLATE
+    # Sent verbatim and first, so Ollama can reuse its cached prefix
+    static_instruction=PROMPT_TEMPLATE,
 )
@@ -1,7 +1,9 @@
 from google.adk.agents.llm_agent import Agent
-from google.adk.models.google_llm import Gemini
-from google.genai import types
-from google.adk.models.lite_llm import LiteLlm
+
+from agent_registry import lazy_litellm
+from tools.llm_cache import llm_cache_callbacks
+from tools.blueprint import BLUEPRINT_KEY, Blueprint
+from tools.prompt_cache import ollama_cache_options
 
 PROMPT = """
 YOU ARE "NEURAL-ARCHITECT", AN ELITE AI RESEARCHER AND SYSTEM DESIGNER SPECIALIZED IN DEEP LEARNING STRATEGY. YOU RUN ON GEMINI 2.0.
@@ -41,13 +43,15 @@ Before generating the Blueprint, you must reason through these steps:
 ====================================================================== 
 ### FINAL OUTPUT FORMAT: THE BLUEPRINT
 
-You must end your response with a structured JSON block labeled `### TECHNICAL_BLUEPRINT`. 
+Your response is ONLY the blueprint, as a single JSON object (no markdown fence, no text around it).
+Condense the chain of thought above into `design_rationale`.
 
 Structure:
 ```json
 {
   "project_name": "String",
   "task_type": "Classification | Regression | Seq2Seq...",
+  "design_rationale": "String (why this architecture, key shape calculations)",
   "data_spec": {
     "input_shape": "[Batch, Channels, Height, Width] or [Batch, Seq_Len, Features]",
     "output_shape": "[Batch, Output_Dim]",
@@ -87,22 +91,21 @@ Structure:
 
 ### NEGATIVE PROMPT (WHAT NOT TO DO)
 
-1.  **DO NOT WRITE PYTHON CODE.** Your output is text and JSON only.
+1.  **DO NOT WRITE PYTHON CODE.** Your output is the JSON blueprint only.
 2.  **DO NOT BE VAGUE.** Do not say "Add some conv layers." Say "Add 3 Conv blocks with increasing channels [32, 64, 128]."
 3.  **DO NOT IGNORE DIMENSIONS.** You must verify that the output of the encoder matches the input of the classifier.
 
 YOU ARE THE ARCHITECT. PLAN THE SOLUTION."""
 
 root_agent = Agent(
-#     model=Gemini(
-#       model='gemini-2.0-flash-lite',
-#       retry_options=types.HttpRetryOptions(
-#         initial_delay=1,
-#         attempts=2
-#       )
-#     ),
-    model=LiteLlm(model="ollama_chat/gpt-oss:20b"),
+#     model=lazy_gemini('gemini-2.0-flash-lite', retry_options={"initial_delay": 1, "attempts": 2}),
+    model=lazy_litellm("ollama_chat/gpt-oss:20b", **ollama_cache_options()),
     name='marialuisa',
     description='A planner assistant for make planes abaout users requests for create deep learning models.',
-    instruction=PROMPT,
+    # Sent verbatim and first, so Ollama can reuse its cached prefix
+    static_instruction=PROMPT,
+    # Validated blueprint in session.state["blueprint"] for eugenio
+    output_schema=Blueprint,
+    output_key=BLUEPRINT_KEY,
+    **llm_cache_callbacks(),
 )
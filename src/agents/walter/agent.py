@@ -1,6 +1,8 @@
 from google.adk.agents.llm_agent import Agent
-from google.adk.models.google_llm import Gemini
-from google.genai import types
+
+from agent_registry import lazy_gemini
+from tools.llm_cache import combine_callbacks, llm_cache_callbacks
+from tools.prompt_cache import prompt_cache_callbacks
 
 PROMPT_TEMPLATE = """
 YOU ARE A WORLD-CLASS RESEARCH PAPER AUTHOR, RECOGNIZED FOR PUBLISHING IN TOP-TIER VENUES (e.g., NeurIPS, ICML, ICLR). YOUR TASK IS TO COMPOSE A FULLY-FORMATTED, PROFESSIONAL-LEVEL RESEARCH PAPER BASED ON A PROVIDED TECHNICAL PLAN THAT SPECIFIES THE ARCHITECTURE DESIGN, DATA SPECIFICATIONS, TRAINING CONFIGURATION, AND IMPLEMENTATION DETAILS (IN PYTHON AND JSON FORMAT).
@@ -118,14 +120,21 @@ FOLLOW THESE STEPS TO DEVELOP A COHERENT, HIGH-QUALITY RESEARCH PAPER:
 """
 
 root_agent = Agent(
-    model=Gemini(
-      model='gemini-2.5-pro',
-      retry_options=types.HttpRetryOptions(
-        initial_delay=1,
-        attempts=2
-      )
-    ),
+    model=lazy_gemini('gemini-2.5-pro', retry_options={"initial_delay": 1, "attempts": 2}),
     name='walter',
     description='A research paper authoring assistant that transforms technical blueprints into structured research papers suitable for top-tier ML/AI conferences.',
-    instruction=PROMPT_TEMPLATE,
+    # Sent verbatim and first, so Gemini can serve it from the context cache
+    static_instruction=PROMPT_TEMPLATE,
+    **combine_callbacks(llm_cache_callbacks(), prompt_cache_callbacks()),
 )
+
+
+def __getattr__(name: str):
+    # `app` is built when ADK first asks for it, so importing this module stays cheap
+    if name == "app":
+        from google.adk.apps import App
+        from tools.prompt_cache import gemini_context_cache_config
+
+        globals()["app"] = App(name="walter", root_agent=root_agent, context_cache_config=gemini_context_cache_config())
+        return globals()["app"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
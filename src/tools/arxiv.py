@@ -2,20 +2,33 @@
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import json
 from datetime import datetime
-from typing import Any, Dict, List, Optional, AsyncGenerator
+from os import getenv
+from enum import Enum
+from functools import lru_cache
+from typing import Any, AsyncGenerator, Dict, Iterable, Iterator, List, MutableMapping, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
 from typing_extensions import override
 
 # ADK imports
 from google.adk.agents import LlmAgent, SequentialAgent, BaseAgent
+from google.adk.agents.callback_context import CallbackContext
 from google.adk.agents.invocation_context import InvocationContext
-from google.adk.events import Event
-from google.adk.sessions import InMemorySessionService
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.adk.events import Event, EventActions
 from google.adk.runners import Runner
 from google.genai import types as genai_types
 
+from tools.crawl_cache import normalize_url
+from tools.llm_cache import combine_callbacks, llm_cache_callbacks
+from tools.payload_store import PayloadStore
+from tools.semantic_cache import QuestionCache
+from tools.session_store import ResumableSequentialAgent, SqliteSessionService, resume_or_create_session
+
 
 # -------------------------------------------------------------------
 # 1. Domain models (como en tu código original)
@@ -44,7 +57,7 @@ class ResearchReport(BaseModel):
     metadata: Dict[str, Any] = Field(default_factory=dict)
 
 
-class ResearchStatus(str):
+class ResearchStatus(str, Enum):
     PENDING = "PENDING"
     RUNNING = "RUNNING"
     DONE = "DONE"
@@ -77,19 +90,239 @@ class ResearchState(BaseModel):
 
 STATE_KEY = "research_state"
 
+# Campos que solo crecen: se guardan en trozos para que cada paso escriba solo lo nuevo
+APPEND_ONLY_FIELDS = ("sources", "passages")
+
+
+def _state_key(field: str, chunk: Any = None) -> str:
+    return f"{STATE_KEY}:{field}" if chunk is None else f"{STATE_KEY}:{field}:{chunk}"
+
+
+def _item_digest(item: Any) -> str:
+    """Hash de un elemento ya volcado a JSON"""
+    return hashlib.sha256(json.dumps(item, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _chunk_items(chunk: Any) -> List[Any]:
+    """Elementos de un trozo guardado en línea, o sus handles si es externo"""
+    return chunk["handles"] if isinstance(chunk, dict) else chunk
+
+
+@lru_cache(maxsize=None)
+def _field_adapter(field: str) -> TypeAdapter:
+    return TypeAdapter(ResearchState.model_fields[field].annotation)
 
-def get_research_state(ctx: InvocationContext) -> ResearchState:
-    raw = ctx.session.state.get(STATE_KEY)
-    if raw is None:
-        # Inicializa un estado vacío si no existe
-        state = ResearchState()
-        ctx.session.state[STATE_KEY] = state.model_dump()
-        return state
-    return ResearchState.model_validate(raw)
 
+class ResearchStateStore:
+    """
+    Vista incremental de ResearchState sobre session.state.
+
+    Cada campo vive en su propia clave (`research_state:<campo>`) y `sources` /
+    `passages` se guardan como trozos append-only (`research_state:passages:<n>`),
+    así un paso solo escribe lo que cambió en lugar de todo el estado.
+    La validación es perezosa: un campo se valida la primera vez que se lee y
+    las listas grandes se validan trozo a trozo mientras se iteran.
+    Lo escrito se acumula en `delta`, listo para `EventActions(state_delta=...)`.
+
+    Con un `PayloadStore`, los elementos de `sources` / `passages` se guardan
+    fuera de la sesión y esos trozos solo contienen sus handles
+    (`{"handles": [...]}`); cada trozo dice si es externo, así una sesión puede
+    mezclar trozos escritos con y sin store. `page()` permite recorrerlos por
+    páginas sin cargarlos todos.
+    """
 
-def set_research_state(ctx: InvocationContext, state: ResearchState) -> None:
-    ctx.session.state[STATE_KEY] = state.model_dump()
+    def __init__(
+        self,
+        state: MutableMapping[str, Any],
+        payloads: Optional[PayloadStore] = None,
+        session_id: str = "",
+    ):
+        self._state = state
+        self._payloads = payloads
+        self._session_id = session_id
+        self._cache: Dict[str, Any] = {}
+        self.delta: Dict[str, Any] = {}
+
+    @classmethod
+    def from_context(cls, ctx: InvocationContext, payloads: Optional[PayloadStore] = None) -> "ResearchStateStore":
+        return cls(ctx.session.state, payloads=payloads, session_id=ctx.session.id)
+
+    def get(self, field: str) -> Any:
+        if field in APPEND_ONLY_FIELDS:
+            return list(self.iter(field))
+        if field not in self._cache:
+            raw = self._state.get(_state_key(field))
+            if raw is None:
+                self._cache[field] = ResearchState.model_fields[field].get_default(call_default_factory=True)
+            else:
+                self._cache[field] = _field_adapter(field).validate_python(raw)
+        return self._cache[field]
+
+    def set(self, field: str, value: Any) -> None:
+        if field in APPEND_ONLY_FIELDS:
+            raise ValueError(f"{field} is append-only, use append()")
+        self._write(_state_key(field), _field_adapter(field).dump_python(value, mode="json"))
+        self._cache[field] = value
+
+    def append(self, field: str, items: Iterable[Any]) -> None:
+        """Añade elementos a `sources` o `passages` escribiendo solo un trozo nuevo"""
+        items = list(items)
+        if items:
+            self._append_dumped(field, _field_adapter(field).dump_python(items, mode="json"))
+
+    def replace(self, field: str, items: Iterable[Any]) -> None:
+        """Reescribe un campo append-only entero, p. ej. tras editar o reordenar elementos ya guardados"""
+        self._clear(field)
+        self.append(field, items)
+
+    def chunk_count(self, field: str) -> int:
+        return self._state.get(_state_key(field, "chunks"), 0)
+
+    def count(self, field: str) -> int:
+        # Con payloads externos los trozos solo tienen handles, no hace falta cargarlos
+        return sum(len(_chunk_items(chunk)) for chunk in self._stored_chunks(field))
+
+    def iter(self, field: str) -> Iterator[Any]:
+        """Elementos validados de un campo append-only, validando un trozo a la vez"""
+        adapter = _field_adapter(field)
+        for chunk in self._raw_chunks(field):
+            yield from adapter.validate_python(chunk)
+
+    def iter_raw(self, field: str) -> Iterator[Dict[str, Any]]:
+        """Elementos de un campo append-only tal como están guardados, sin validar"""
+        for chunk in self._raw_chunks(field):
+            yield from chunk
+
+    def page(self, field: str, offset: int = 0, limit: int = 50) -> List[Any]:
+        """Elementos validados [offset, offset + limit) de un campo append-only"""
+        selected: List[Any] = []
+        for chunk in self._stored_chunks(field):
+            items = _chunk_items(chunk)
+            if offset >= len(items):
+                offset -= len(items)
+                continue
+            # Solo se cargan del store los handles de la página
+            selected.extend(self._resolve(chunk, items[offset:offset + limit - len(selected)]))
+            offset = 0
+            if len(selected) >= limit:
+                break
+        return _field_adapter(field).validate_python(selected)
+
+    def to_model(self) -> ResearchState:
+        """Materializa el ResearchState completo (O(tamaño del estado))"""
+        return ResearchState(**{field: self.get(field) for field in ResearchState.model_fields})
+
+    def update_from(self, state: ResearchState) -> None:
+        """
+        Escribe solo los campos de `state` que difieren de lo guardado. De una
+        lista append-only solo se vuelca la cola nueva, sin serializar lo ya
+        guardado: se reescribe entera si se acortó o si cambió su último
+        elemento guardado (comparado por hash). Para editar elementos
+        anteriores usar `replace()`.
+        """
+        for field in ResearchState.model_fields:
+            value = getattr(state, field)
+            if field not in APPEND_ONLY_FIELDS:
+                adapter = _field_adapter(field)
+                dumped = adapter.dump_python(value, mode="json")
+                if _state_key(field) in self._state:
+                    stored = self._state[_state_key(field)]
+                else:
+                    default = ResearchState.model_fields[field].get_default(call_default_factory=True)
+                    stored = adapter.dump_python(default, mode="json")
+                if stored != dumped:
+                    self._write(_state_key(field), dumped)
+                    self._cache[field] = value
+                continue
+            stored = self.count(field)
+            if stored and (len(value) < stored or not self._ends_with(field, value[stored - 1])):
+                # La lista se acortó o no continúa a lo guardado: se reescribe desde cero
+                self._clear(field)
+                stored = 0
+            if len(value) > stored:
+                self.append(field, value[stored:])
+
+    def pop_delta(self) -> Dict[str, Any]:
+        delta, self.delta = self.delta, {}
+        return delta
+
+    def _append_dumped(self, field: str, dumped: List[Any]) -> None:
+        chunks = self.chunk_count(field)
+        last = _item_digest(dumped[-1])
+        if self._payloads is not None:
+            # En la sesión solo quedan los handles
+            dumped = {"handles": self._payloads.put_many(self._session_id, field, dumped)}
+        self._write(_state_key(field, chunks), dumped)
+        self._write(_state_key(field, "chunks"), chunks + 1)
+        self._write(_state_key(field, "last"), last)
+
+    def _ends_with(self, field: str, item: Any) -> bool:
+        """Si `item` es el último elemento guardado de un campo append-only"""
+        dumped = _field_adapter(field).dump_python([item], mode="json")[0]
+        return _item_digest(dumped) == self._last_digest(field)
+
+    def _last_digest(self, field: str) -> Optional[str]:
+        """Hash del último elemento guardado de un campo append-only"""
+        digest = self._state.get(_state_key(field, "last"))
+        if digest is None:
+            # Sesiones guardadas antes de que existiera el hash: solo hace falta leer el último trozo con elementos
+            for chunk in reversed(list(self._stored_chunks(field))):
+                items = _chunk_items(chunk)
+                if items:
+                    return _item_digest(self._resolve(chunk, items[-1:])[0])
+        return digest
+
+    def _stored_chunks(self, field: str) -> Iterator[Any]:
+        """Trozos tal como están en la sesión: una lista de elementos o `{"handles": [...]}`"""
+        for chunk in range(self.chunk_count(field)):
+            yield self._state.get(_state_key(field, chunk)) or []
+
+    def _raw_chunks(self, field: str) -> Iterator[List[Any]]:
+        for chunk in self._stored_chunks(field):
+            yield self._resolve(chunk, _chunk_items(chunk))
+
+    def _resolve(self, chunk: Any, items: List[Any]) -> List[Any]:
+        """`items` de `chunk` como elementos, cargándolos del PayloadStore si el trozo es externo"""
+        if not isinstance(chunk, dict):
+            return items
+        return self._require_payloads().get_many(items)
+
+    def _require_payloads(self) -> PayloadStore:
+        if self._payloads is None:
+            raise RuntimeError("research state is kept in a PayloadStore; pass it to ResearchStateStore")
+        return self._payloads
+
+    def _clear(self, field: str) -> None:
+        """Vacía un campo append-only y borra del PayloadStore los elementos que ya nadie referencia"""
+        handles = [
+            handle for chunk in self._stored_chunks(field) if isinstance(chunk, dict) for handle in chunk["handles"]
+        ]
+        if handles:
+            self._require_payloads().delete_many(handles)
+        for chunk in range(self.chunk_count(field)):
+            self._write(_state_key(field, chunk), [])
+        self._write(_state_key(field, "chunks"), 0)
+        self._write(_state_key(field, "last"), None)
+
+    def _write(self, key: str, value: Any) -> None:
+        self._state[key] = value
+        self.delta[key] = value
+
+
+def get_research_state(ctx: InvocationContext, payloads: Optional[PayloadStore] = None) -> ResearchState:
+    """Estado completo; para pasos que solo tocan algunos campos usar ResearchStateStore"""
+    return ResearchStateStore.from_context(ctx, payloads=payloads).to_model()
+
+
+def set_research_state(
+    ctx: InvocationContext,
+    state: ResearchState,
+    payloads: Optional[PayloadStore] = None,
+) -> Dict[str, Any]:
+    """Guarda solo lo que cambió y devuelve ese delta"""
+    store = ResearchStateStore.from_context(ctx, payloads=payloads)
+    store.update_from(state)
+    return store.pop_delta()
 
 
 # -------------------------------------------------------------------
@@ -100,6 +333,22 @@ class PlannerOutput(BaseModel):
     sub_questions: List[SubQuestion]
 
 
+def _planner_callbacks() -> Dict[str, Any]:
+    """Cache exacto de respuestas y, detrás, el de preguntas parecidas (SEMANTIC_CACHE=off lo quita)"""
+    callbacks = llm_cache_callbacks()
+    if getenv("SEMANTIC_CACHE", "on") == "off":
+        return callbacks
+    questions = QuestionCache.default()
+    return combine_callbacks(
+        callbacks,
+        {
+            "before_model_callback": questions.before_model,
+            "after_model_callback": questions.after_model,
+            "on_model_error_callback": questions.on_model_error,
+        },
+    )
+
+
 def build_planner_agent(model_name: str = "gemini-2.0-flash") -> LlmAgent:
     """
     Agent que descompone la pregunta de investigación en sub-preguntas.
@@ -137,12 +386,28 @@ Return ONLY valid JSON matching this schema:
         description="Decomposes a research question into focused sub-questions.",
         instruction=instruction,
         output_schema=PlannerOutput,
-        # Guardamos el JSON (como texto) en session.state["planner_raw_output"]
+        # El JSON (como texto) pasa por session.state["planner_raw_output"] y
+        # _store_plan lo deja en research_state:sub_questions
         output_key="planner_raw_output",
         include_contents="none",
+        after_agent_callback=_store_plan,
+        **_planner_callbacks(),
     )
 
 
+
+def _store_plan(callback_context: CallbackContext) -> None:
+    """Pasa las sub-preguntas del planner a ResearchStateStore y suelta el JSON crudo de `planner_raw_output`"""
+    plan = _parse_output(callback_context.state.get("planner_raw_output"), PlannerOutput)
+    if plan is None:
+        return None
+    store = ResearchStateStore(callback_context.state)
+    store.set("research_question", ResearchQuestion(text=callback_context.state.get("research_question_text", "")))
+    store.set("sub_questions", plan.sub_questions)
+    store.set("current_step", "planned")
+    callback_context.state["planner_raw_output"] = None
+    return None
+
 # -------------------------------------------------------------------
 # 4. Searcher, Ranker, Writer como LlmAgents (esqueletos)
 # -------------------------------------------------------------------
@@ -162,4 +427,293 @@ You are a web research search expert.
 You are given JSON with sub-questions in the state key `planner_raw_output`.
 Parse it and propose:
 
-- A
+- A list of 2-3 web search queries for each sub-question.
+- A list of candidate sources (web pages or arXiv papers) likely to answer them.
+
+Return ONLY valid JSON matching this schema:
+
+{
+  "search_queries": ["query 1", "query 2", ...],
+  "sources": [
+    {
+      "id": "short-stable-id",
+      "url": "https://...",
+      "title": "Title of the page or paper",
+      "snippet": "Why this source is relevant"
+    },
+    ...
+  ]
+}
+"""
+
+    return LlmAgent(
+        model=model_name,
+        name="searcher",
+        description="Turns sub-questions into search queries and candidate sources.",
+        instruction=instruction,
+        output_schema=SearcherOutput,
+        output_key="searcher_raw_output",
+        include_contents="none",
+        **llm_cache_callbacks(),
+    )
+
+
+
+def build_sub_question_searcher(
+    sub_question: SubQuestion,
+    name: str,
+    model_name: str = "gemini-2.0-flash",
+) -> LlmAgent:
+    """
+    Searcher para una sola sub-pregunta. La instrucción se da como función
+    para que el texto de la sub-pregunta no pase por la plantilla de estado.
+    """
+    instruction = f"""
+You are a web research search expert.
+
+Sub-question:
+{sub_question.text}
+
+Propose:
+
+- 2-3 web search queries for this sub-question.
+- A list of candidate sources (web pages or arXiv papers) likely to answer it.
+
+Return ONLY valid JSON matching this schema:
+
+{{
+  "search_queries": ["query 1", "query 2", ...],
+  "sources": [
+    {{
+      "id": "short-stable-id",
+      "url": "https://...",
+      "title": "Title of the page or paper",
+      "snippet": "Why this source is relevant"
+    }},
+    ...
+  ]
+}}
+"""
+
+    def provide_instruction(_: ReadonlyContext) -> str:
+        return instruction
+
+    return LlmAgent(
+        model=model_name,
+        name=name,
+        description=f"Search queries and candidate sources for sub-question {sub_question.id}.",
+        instruction=provide_instruction,
+        output_schema=SearcherOutput,
+        output_key=f"{name}_output",
+        include_contents="none",
+        **llm_cache_callbacks(),
+    )
+
+
+def _parse_output(raw: Any, model: type[BaseModel]) -> Optional[BaseModel]:
+    """Salida de un LlmAgent en session.state, sea dict o texto JSON"""
+    if raw is None:
+        return None
+    if isinstance(raw, str):
+        return model.model_validate(json.loads(raw))
+    return model.model_validate(raw)
+
+
+def merge_searcher_outputs(outputs: Iterable[SearcherOutput]) -> SearcherOutput:
+    """Une las salidas de cada sub-pregunta; queries y fuentes (por URL normalizada) sin repetir"""
+    queries: Dict[str, None] = {}
+    sources: Dict[str, Source] = {}
+    for output in outputs:
+        for query in output.search_queries:
+            queries.setdefault(query.strip(), None)
+        for source in output.sources:
+            sources.setdefault(normalize_url(source.url), source)
+    return SearcherOutput(search_queries=list(queries), sources=list(sources.values()))
+
+
+class SubQuestionFanOutAgent(BaseAgent):
+    """
+    Lanza un searcher por sub-pregunta de `research_state:sub_questions`, como
+    mucho `max_concurrency` a la vez, y guarda la unión de sus resultados con
+    ResearchStateStore: `search_queries` y un trozo nuevo de `sources`. La
+    latencia pasa a ser la de la sub-pregunta más lenta en lugar de la suma
+    de todas. Una sub-pregunta cuyo searcher falla o cuya salida no se puede
+    leer no tumba la unión ni a los demás searchers: queda anotada en
+    `searcher_failed`.
+    """
+
+    model_name: str = "gemini-2.0-flash"
+    max_concurrency: int = 4
+    # Con un PayloadStore, `sources` solo deja handles en la sesión
+    payloads: Optional[PayloadStore] = None
+
+    @override
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        store = ResearchStateStore.from_context(ctx, payloads=self.payloads)
+        sub_questions = store.get("sub_questions")
+        if not sub_questions:
+            # Sesiones cuyo planner terminó antes de que guardara en el store
+            plan = _parse_output(ctx.session.state.get("planner_raw_output"), PlannerOutput)
+            sub_questions = plan.sub_questions if plan is not None else []
+        if not sub_questions:
+            raise ValueError("research state has no sub-questions to search")
+
+        searchers = [
+            build_sub_question_searcher(sub_question, f"searcher_{i}", self.model_name)
+            for i, sub_question in enumerate(sub_questions)
+        ]
+        errors: Dict[str, str] = {}
+        async for event in self._run_bounded(ctx, searchers, errors):
+            yield event
+
+        outputs: List[SearcherOutput] = []
+        failed: List[Dict[str, str]] = []
+        for sub_question, searcher in zip(sub_questions, searchers):
+            if searcher.name in errors:
+                failed.append({"id": sub_question.id, "error": errors[searcher.name]})
+                continue
+            try:
+                output = _parse_output(ctx.session.state.get(searcher.output_key), SearcherOutput)
+            except ValueError as exc:
+                # JSON inválido o que no cumple el esquema (ValidationError es un ValueError)
+                failed.append({"id": sub_question.id, "error": str(exc)})
+                continue
+            if output is None:
+                failed.append({"id": sub_question.id, "error": "no output"})
+            else:
+                outputs.append(output)
+        merged = merge_searcher_outputs(outputs)
+        store.set("search_queries", merged.search_queries)
+        store.append("sources", merged.sources)
+        store.set("current_step", "searched")
+        # Las salidas crudas de cada searcher ya están en el store
+        state_delta = {searcher.output_key: None for searcher in searchers}
+        state_delta.update(store.pop_delta())
+        state_delta["searcher_failed"] = failed
+        yield Event(
+            invocation_id=ctx.invocation_id,
+            author=self.name,
+            branch=ctx.branch,
+            actions=EventActions(state_delta=state_delta),
+        )
+
+    async def _run_bounded(
+        self, ctx: InvocationContext, agents: List[BaseAgent], errors: Dict[str, str]
+    ) -> AsyncGenerator[Event, None]:
+        """
+        Ejecuta los agentes en paralelo (cada uno en su rama) y va cediendo sus
+        eventos según llegan. Si un agente falla, su error queda en `errors`
+        (por nombre) y los demás siguen.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        done = object()
+
+        async def drive(agent: BaseAgent) -> None:
+            branch = f"{ctx.branch}.{agent.name}" if ctx.branch else f"{self.name}.{agent.name}"
+            async with semaphore:
+                try:
+                    async for event in agent.run_async(ctx.model_copy(update={"branch": branch})):
+                        await queue.put(event)
+                except Exception as exc:
+                    errors[agent.name] = f"{type(exc).__name__}: {exc}"
+
+        tasks = [asyncio.create_task(drive(agent)) for agent in agents]
+
+        async def drive_all() -> None:
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                await queue.put(done)
+
+        runner = asyncio.create_task(drive_all())
+        try:
+            while (event := await queue.get()) is not done:
+                yield event
+            await runner
+        finally:
+            # Si se cierra o cancela el generador, nadie más cancelaría las tareas que siguen en marcha
+            for task in (*tasks, runner):
+                task.cancel()
+            await asyncio.gather(*tasks, runner, return_exceptions=True)
+
+
+# -------------------------------------------------------------------
+# 5. Pipeline con sesiones persistentes
+# -------------------------------------------------------------------
+
+APP_NAME = "deep_research"
+
+
+def build_research_pipeline(
+    model_name: str = "gemini-2.0-flash",
+    max_concurrency: int = 4,
+    payloads: Optional[PayloadStore] = None,
+) -> ResumableSequentialAgent:
+    """
+    Planner -> un searcher por sub-pregunta en paralelo. Cada paso terminado queda registrado en la sesión,
+    así que al relanzar con el mismo session_id se retoma donde se quedó. Las fuentes se guardan en
+    `payloads` (por defecto PayloadStore.default()) y la sesión solo lleva sus handles.
+    """
+    return ResumableSequentialAgent(
+        name="research_pipeline",
+        description="Plans and searches a research question, resuming from the last completed step.",
+        sub_agents=[
+            build_planner_agent(model_name),
+            SubQuestionFanOutAgent(
+                name="searcher",
+                description="Searches every sub-question concurrently and merges their sources.",
+                model_name=model_name,
+                max_concurrency=max_concurrency,
+                payloads=payloads or PayloadStore.default(),
+            ),
+        ],
+    )
+
+
+async def run_research_pipeline(
+    question: str,
+    session_id: str,
+    user_id: str = "default",
+    model_name: str = "gemini-2.0-flash",
+    session_service: Optional[SqliteSessionService] = None,
+    payloads: Optional[PayloadStore] = None,
+) -> Dict[str, Any]:
+    """
+    Ejecuta (o reanuda) el pipeline para `session_id` y devuelve el estado final
+    de la sesión. Si el proceso se cae, volver a llamar con el mismo session_id
+    solo repite los pasos que no habían terminado. La pregunta queda guardada
+    en la sesión: reanudar un session_id con otra pregunta es un ValueError.
+    Las fuentes del estado devuelto son handles de `payloads`; se leen con
+    ResearchStateStore(state, payloads=...).
+    """
+    service = session_service or SqliteSessionService()
+    try:
+        session = await resume_or_create_session(
+            service,
+            app_name=APP_NAME,
+            user_id=user_id,
+            session_id=session_id,
+            state={
+                "research_question_text": question,
+                "current_date": datetime.now().strftime("%Y-%m-%d"),
+            },
+        )
+        stored_question = session.state.get("research_question_text")
+        if stored_question != question:
+            raise ValueError(
+                f"Session {session_id!r} belongs to the question {stored_question!r}; use a new session_id for {question!r}"
+            )
+        runner = Runner(
+            agent=build_research_pipeline(model_name, payloads=payloads), app_name=APP_NAME, session_service=service
+        )
+        message = genai_types.Content(role="user", parts=[genai_types.Part(text=question)])
+        async for _ in runner.run_async(user_id=user_id, session_id=session.id, new_message=message):
+            pass
+        session = await service.get_session(app_name=APP_NAME, user_id=user_id, session_id=session.id)
+    finally:
+        # Lo ya ejecutado queda guardado aunque algo falle, y el servicio propio se cierra siempre
+        await service.flush()
+        if session_service is None:
+            await service.close()
+    return dict(session.state)
@@ -0,0 +1,47 @@
+import json
+from typing import Any, List, Mapping, Optional
+
+from pydantic import BaseModel, Field
+
+# session.state key where marialuisa leaves the validated blueprint
+BLUEPRINT_KEY = "blueprint"
+
+
+class DataSpec(BaseModel):
+    input_shape: str = Field(description="[Batch, Channels, Height, Width] or [Batch, Seq_Len, Features]")
+    output_shape: str = Field(description="[Batch, Output_Dim]")
+    data_type: str = Field(description="Float32 | Long (for tokens)")
+
+
+class ArchitectureDesign(BaseModel):
+    model_family: str = Field(description="e.g. Transformer Encoder")
+    layer_structure: List[str] = Field(description="One entry per layer, e.g. 'Conv2d 3->64, k=3'")
+    special_mechanisms: str = Field(default="", description="Attention heads, skip connections, dropout rate")
+
+
+class TrainingConfig(BaseModel):
+    loss_function: str = Field(description="Exact PyTorch class name, e.g. nn.CrossEntropyLoss")
+    optimizer: str = Field(description="Adam | SGDW")
+    suggested_lr: float
+    batch_size_recommendation: int
+
+
+class Blueprint(BaseModel):
+    """Technical blueprint marialuisa designs and eugenio implements"""
+
+    project_name: str
+    task_type: str = Field(description="Classification | Regression | Seq2Seq...")
+    design_rationale: str = Field(description="Condensed chain of thought: why this architecture and these shapes")
+    data_spec: DataSpec
+    architecture_design: ArchitectureDesign
+    training_config: TrainingConfig
+
+
+def blueprint_from_state(state: Mapping[str, Any]) -> Optional[Blueprint]:
+    """Blueprint stored by marialuisa's output_key, as a dict or JSON text"""
+    raw = state.get(BLUEPRINT_KEY)
+    if raw is None:
+        return None
+    if isinstance(raw, str):
+        raw = json.loads(raw)
+    return Blueprint.model_validate(raw)
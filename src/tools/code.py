@@ -1,50 +1,769 @@
+import ast
+import asyncio
+import hashlib
+import json
+import os
+import re
+import shlex
+import signal
+import sqlite3
 import subprocess
+import sys
 import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from os import getenv
+from pathlib import Path
+from typing import Any, AsyncIterator
 
-def send_to_env(content: str) -> dict:
-    with tempfile.NamedTemporaryFile(delete=True) as temp_file:
-        temp_file.write(content.encode('utf-8'))
-        temp_file.flush()
+LOG_MARKER = "__TOOLS_CODE_OUTPUT_LOG__"
+DEFAULT_RESULT_CACHE = Path.home() / ".cache" / "codeagent" / "exec_cache.sqlite"
+METRICS_MARKER = "__TOOLS_CODE_METRICS__"
+PROFILE_MARKER = "__TOOLS_CODE_PROFILE__"
+METRICS_SCHEMA_VERSION = 1
 
-        user = getenv("REMOTE_USER", "user")
+# JSON Schema of result["metrics"]; EXEC_METRICS_LOG holds one such object per line
+EXECUTION_METRICS_SCHEMA = {
+    "$schema": "https://json-schema.org/draft/2020-12/schema",
+    "title": "ExecutionMetrics",
+    "type": "object",
+    "required": ["schema_version", "backend", "wall_time_s"],
+    "properties": {
+        "schema_version": {"const": METRICS_SCHEMA_VERSION},
+        "backend": {"enum": ["local", "ssh"]},
+        "wall_time_s": {"type": "number", "minimum": 0},
+        "cpu_time_s": {"type": ["number", "null"], "minimum": 0},
+        "peak_rss_mb": {"type": ["number", "null"], "minimum": 0},
+        # True when the result was replayed from the result cache; such runs are not logged
+        "cached": {"type": "boolean"},
+        "hotspots": {
+            "type": ["array", "null"],
+            "items": {
+                "type": "object",
+                "required": ["function", "calls", "total_time_s", "cumulative_time_s"],
+                "properties": {
+                    "function": {"type": "string"},
+                    "calls": {"type": "integer"},
+                    "total_time_s": {"type": "number"},
+                    "cumulative_time_s": {"type": "number"},
+                },
+            },
+        },
+    },
+}
+
+# Runs the command in its arguments (test.sh, or a candidate script) and reports
+# the CPU time and peak RSS of everything it started
+RUSAGE_WRAPPER = (
+    "import json, resource, subprocess, sys\n"
+    "status = subprocess.call(sys.argv[1:])\n"
+    "usage = resource.getrusage(resource.RUSAGE_CHILDREN)\n"
+    "sys.stderr.write('\\n" + METRICS_MARKER + "' + json.dumps({"
+    "'cpu_time_s': round(usage.ru_utime + usage.ru_stime, 3), "
+    "'peak_rss_mb': round(usage.ru_maxrss / 1024, 1)}) + '\\n')\n"
+    "sys.exit(status)\n"
+)
+
+# Applies the sandbox rlimits inside the child itself, then runs the script as __main__:
+# python -c RLIMIT_BOOTSTRAP <memory_bytes> <cpu_seconds> main.py (0 = no limit)
+RLIMIT_BOOTSTRAP = (
+    "import resource, runpy, sys\n"
+    "memory, cpu = int(sys.argv[1]), int(sys.argv[2])\n"
+    "if memory:\n"
+    "    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))\n"
+    "if cpu:\n"
+    "    resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu))\n"
+    "sys.argv = sys.argv[3:]\n"
+    "runpy.run_path(sys.argv[0], run_name='__main__')\n"
+)
+
+# The script is compiled under its own name and registered in linecache (read by
+# the pure-Python traceback printer), so tracebacks keep its lines and line numbers
+PROFILE_HARNESS = """import atexit as _atexit, cProfile as _cProfile, json as _json, linecache as _linecache, pstats as _pstats, sys as _sys, traceback as _traceback
+_source = {source}
+_linecache.cache["generated.py"] = (len(_source), None, _source.splitlines(True), "generated.py")
+_sys.excepthook = _traceback.print_exception
+_profile = _cProfile.Profile()
+def _report_hotspots():
+    _profile.disable()
+    stats = _pstats.Stats(_profile)
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:{top_n}]
+    hotspots = [
+        {{"function": f"{{file}}:{{line}}({{name}})", "calls": calls, "total_time_s": round(tt, 4), "cumulative_time_s": round(ct, 4)}}
+        for (file, line, name), (_, calls, tt, ct, _) in rows
+    ]
+    _sys.stderr.write("\\n{marker}" + _json.dumps(hotspots) + "\\n")
+_atexit.register(_report_hotspots)
+_profile.enable()
+exec(compile(_source, "generated.py", "exec"), {{"__name__": "__main__"}})
+"""
+
+LOSS_RE = re.compile(r"loss\W{0,3}\s*([-+]?\d*\.?\d+(?:[eE][-+]?\d+)?)", re.IGNORECASE)
+
+
+def send_to_env(content: str, use_cache: bool = True, profile: bool = False) -> dict:
+    """
+    Sends the code to the execution environment and runs it.
+    The environment is chosen with EXEC_BACKEND (ssh, local or pool).
+    Args:
+        content: The Python code to run.
+        use_cache: Reuse the result of an identical script that already ran.
+            Set it to False for scripts whose output is not deterministic.
+        profile: Run the script under cProfile and report its slowest functions.
+    Returns:
+        dict: status, returncode, stdout, stderr and metrics (wall time,
+        CPU time, peak memory and, when profiling, the top hotspots).
+    """
+    backend = get_backend()
+    if use_cache and getenv("EXEC_CACHE", "on") != "off":
+        backend = CachedBackend(backend)
+    if profile:
+        content = _with_profiler(content)
+
+    result = backend.run(content)
+    result["stderr"], hotspots = _pop_marker(result["stderr"], PROFILE_MARKER)
+    if hotspots is None:
+        # test.sh may redirect stderr into output.log, which comes back as stdout
+        result["stdout"], hotspots = _pop_marker(result["stdout"], PROFILE_MARKER)
+    result.setdefault("metrics", {})["hotspots"] = hotspots
+    _log_metrics(result["metrics"])
+    return result
+
+
+class ExecutionBackend:
+    """Somewhere a generated Python script can be run"""
+
+    def run(self, content: str) -> dict:
+        raise NotImplementedError
+
+    def run_many(self, contents: list[str]) -> list[dict]:
+        return [self.run(content) for content in contents]
+
+
+class SSHBackend(ExecutionBackend):
+    """
+    Runs scripts on REMOTE_IP: uploads the code, runs test.sh and collects its
+    log in a single round-trip, the code travelling over stdin of the same ssh
+    session that runs it.
+
+    `run_many` runs up to SSH_WORKERS scripts at once. test.sh always runs the
+    same REMOTE_FILE, so there each script gets its own remote directory and
+    is run directly with REMOTE_PYTHON.
+    """
+
+    def run(self, content: str) -> dict:
         remote_file = getenv("REMOTE_FILE", "/path/to/destination/a.py")
-        remote_ip = getenv("REMOTE_IP", "remote")
+        start = time.perf_counter()
+        res = _run_remote_shell(
+            f"cat > {shlex.quote(remote_file)} && {_run_and_collect_command(measure=True)}", input=content
+        )
+        return self._measured(res, _split_log(res.stdout), start)
 
-        try:
-            res = subprocess.run(
-                ['scp', temp_file.name, f'{user}@{remote_ip}:{remote_file}'],
-                check=True,
-                capture_output=True,
-                text=True,
+    def run_many(self, contents: list[str]) -> list[dict]:
+        workers = int(getenv("SSH_WORKERS", "4"))
+        # Every ssh call reuses the multiplexed master connection, so threads are enough
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(contents)))) as pool:
+            return list(pool.map(self._run_isolated, contents))
+
+    def _run_isolated(self, content: str) -> dict:
+        start = time.perf_counter()
+        res = _run_remote_shell(_isolated_run_command(), input=content)
+        return self._measured(res, res.stdout, start)
+
+    @staticmethod
+    def _measured(res: subprocess.CompletedProcess, stdout: str, start: float) -> dict:
+        stderr, usage = _pop_marker(res.stderr, METRICS_MARKER)
+        result = _result(res.returncode, stdout, stderr)
+        result["metrics"] = {
+            "schema_version": METRICS_SCHEMA_VERSION,
+            "backend": "ssh",
+            # Measured from here, so it includes the network round-trip
+            "wall_time_s": round(time.perf_counter() - start, 3),
+            "cpu_time_s": usage["cpu_time_s"] if usage else None,
+            "peak_rss_mb": usage["peak_rss_mb"] if usage else None,
+        }
+        return result
+
+
+class LocalBackend(ExecutionBackend):
+    """
+    Runs scripts on this machine in a throwaway directory, with a wall-clock
+    timeout and address-space / CPU-time limits applied through setrlimit.
+    The limits are set by a small bootstrap in the child rather than in a
+    preexec_fn, which is not safe when runs are started from threads.
+    """
+
+    def __init__(
+        self,
+        timeout: float | None = 600,
+        memory_mb: int | None = 8192,
+        cpu_seconds: int | None = None,
+        python: str = sys.executable,
+    ):
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self.cpu_seconds = cpu_seconds
+        self.python = python
+
+    def run(self, content: str) -> dict:
+        with tempfile.TemporaryDirectory(prefix="sandbox-") as workdir:
+            script = Path(workdir) / "main.py"
+            script.write_text(content, encoding="utf-8")
+            return self._run_measured(self._command(script), workdir)
+
+    def _command(self, script: Path) -> list[str]:
+        memory = self.memory_mb * 1024 * 1024 if self.memory_mb else 0
+        return [self.python, "-c", RLIMIT_BOOTSTRAP, str(memory), str(self.cpu_seconds or 0), str(script)]
+
+    def _run_measured(self, args: list[str], workdir: str) -> dict:
+        """
+        Popen + os.wait4 instead of subprocess.run, so the child's own rusage
+        (CPU time, peak RSS) is available even when several runs share a process.
+        """
+        start = time.perf_counter()
+        proc = subprocess.Popen(
+            args,
+            cwd=workdir,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            start_new_session=True,
+        )
+        timed_out = threading.Event()
+
+        def kill() -> None:
+            timed_out.set()
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+        timer = threading.Timer(self.timeout, kill) if self.timeout else None
+        with proc.stdout, proc.stderr, ThreadPoolExecutor(max_workers=2) as readers:
+            stdout = readers.submit(proc.stdout.read)
+            stderr = readers.submit(proc.stderr.read)
+            if timer:
+                timer.start()
+            out, err = stdout.result(), stderr.result()
+        # Stop the timer before reaping, so it can never signal a reused process group id
+        if timer:
+            timer.cancel()
+            timer.join()
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+
+        if timed_out.is_set():
+            err += f"\nTimed out after {self.timeout}s"
+        result = _result(-1 if timed_out.is_set() else proc.returncode, out, err)
+        result["metrics"] = {
+            "schema_version": METRICS_SCHEMA_VERSION,
+            "backend": "local",
+            "wall_time_s": round(time.perf_counter() - start, 3),
+            "cpu_time_s": round(usage.ru_utime + usage.ru_stime, 3),
+            # ru_maxrss is reported in kilobytes on Linux
+            "peak_rss_mb": round(usage.ru_maxrss / 1024, 1),
+        }
+        return result
+
+
+class ProcessPoolBackend(LocalBackend):
+    """LocalBackend that runs several scripts side by side, one process each"""
+
+    def __init__(self, max_workers: int | None = None, **kwargs):
+        super().__init__(**kwargs)
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+    def run_many(self, contents: list[str]) -> list[dict]:
+        # Each run is its own subprocess, so threads are enough to keep them in parallel
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return list(pool.map(self.run, contents))
+
+
+class CachedBackend(ExecutionBackend):
+    """
+    Wraps a backend and reuses results of scripts that already ran in the same
+    environment. Scripts are compared by their AST, so edits to comments or
+    formatting still hit the cache.
+    """
+
+    def __init__(self, backend: ExecutionBackend, cache: "ResultCache | None" = None):
+        self.backend = backend
+        self.cache = cache or ResultCache.default()
+
+    def run(self, content: str) -> dict:
+        key = script_fingerprint(content, environment_fingerprint(self.backend))
+        cached = self.cache.get(key)
+        if cached is not None:
+            # The metrics are those of the original run, not of this call
+            return {**cached, "cached": True, "metrics": {**cached.get("metrics", {}), "cached": True}}
+
+        result = self.backend.run(content)
+        # Timeouts and ssh connection failures (255) say nothing about the script itself
+        if result["returncode"] not in (-1, 255):
+            self.cache.put(key, result)
+        return result
+
+
+class ResultCache:
+    """SQLite store of execution results, evicted least-recently-used past max_bytes"""
+
+    _default: "ResultCache | None" = None
+
+    def __init__(self, path: Path | str = DEFAULT_RESULT_CACHE, max_bytes: int = 64 * 1024 * 1024):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                result TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                accessed_at REAL NOT NULL
             )
-            
-            res = execute_script()
-            return {
-                "status": "success",
-                "returncode": res.returncode,
-                "stdout": res.stdout or "file sent and executed successfully",
-                "stderr": res.stderr,
-            }
-        except subprocess.CalledProcessError as e:
+            """
+        )
+        self._conn.commit()
+
+    @classmethod
+    def default(cls) -> "ResultCache":
+        if cls._default is None:
+            cls._default = cls(getenv("EXEC_CACHE_PATH", str(DEFAULT_RESULT_CACHE)))
+        return cls._default
+
+    def get(self, key: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute("SELECT result FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key: str, result: dict) -> None:
+        payload = json.dumps(result)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, result, size, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, payload, len(payload), time.time()),
+            )
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            for old_key, size in self._conn.execute("SELECT key, size FROM results ORDER BY accessed_at ASC").fetchall():
+                if total <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM results WHERE key = ?", (old_key,))
+                total -= size
+            self._conn.commit()
+
+
+def script_fingerprint(content: str, environment: str = "") -> str:
+    """Hash of the script's AST (or of its whitespace-normalized text if it does not parse)"""
+    try:
+        normalized = ast.dump(ast.parse(content))
+    except SyntaxError:
+        normalized = " ".join(content.split())
+    return hashlib.sha256(f"{environment}\0{normalized}".encode("utf-8")).hexdigest()
+
+
+def environment_fingerprint(backend: ExecutionBackend) -> str:
+    """Everything besides the script that can change the result of a run"""
+    if isinstance(backend, SSHBackend):
+        names = ("REMOTE_USER", "REMOTE_IP", "REMOTE_PATH", "REMOTE_FILE", "REMOTE_EXEC")
+        return "ssh:" + ",".join(f"{name}={getenv(name, '')}" for name in names)
+    if isinstance(backend, LocalBackend):
+        return f"local:{backend.python}:{sys.version}:{backend.memory_mb}:{backend.cpu_seconds}:{backend.timeout}"
+    return type(backend).__name__
+
+
+def get_backend(name: str | None = None) -> ExecutionBackend:
+    name = name or getenv("EXEC_BACKEND", "ssh")
+    if name == "ssh":
+        return SSHBackend()
+
+    timeout = getenv("SANDBOX_TIMEOUT")
+    memory_mb = getenv("SANDBOX_MEMORY_MB")
+    limits = {
+        "timeout": float(timeout) if timeout else 600,
+        "memory_mb": int(memory_mb) if memory_mb else 8192,
+    }
+    if name == "local":
+        return LocalBackend(**limits)
+    if name == "pool":
+        workers = getenv("SANDBOX_WORKERS")
+        return ProcessPoolBackend(max_workers=int(workers) if workers else None, **limits)
+    raise ValueError(f"Unknown execution backend: {name}")
+
+
+def evaluate_candidates(candidates: list[str], hyperparameters: list[dict] | None = None) -> dict:
+    """
+    Runs several candidate scripts at the same time and ranks them.
+    Pass either N different implementations in `candidates`, or a single
+    script plus N `hyperparameters` dicts: each variant is run with a
+    `HPARAMS = {...}` line added after its docstring and `__future__` imports,
+    so the script should read its settings with `HPARAMS.get("lr", 1e-3)`.
+    Runs on CANDIDATE_BACKEND, or on EXEC_BACKEND when it is not set
+    ("local" runs in parallel as "pool").
+    Args:
+        candidates: The Python scripts to run.
+        hyperparameters: Optional hyperparameter variants: one per candidate,
+            or any number of them for a single candidate.
+    Returns:
+        dict: status and the ranked results: index, status, returncode,
+        wall time, peak memory, final loss and the tail of the output.
+    """
+    if not candidates:
+        return {"status": "error", "results": [], "stderr": "no candidates given"}
+    if hyperparameters is not None:
+        if not hyperparameters:
+            return {"status": "error", "results": [], "stderr": "hyperparameters is empty"}
+        if len(candidates) == 1:
+            candidates = candidates * len(hyperparameters)
+        elif len(candidates) != len(hyperparameters):
             return {
                 "status": "error",
-                "returncode": e.returncode,
-                "stdout": e.stdout,
-                "stderr": e.stderr,
+                "results": [],
+                "stderr": f"got {len(candidates)} candidates but {len(hyperparameters)} hyperparameter sets",
             }
-    
-    
+        candidates = [_with_hparams(script, params) for script, params in zip(candidates, hyperparameters)]
+
+    backend = getenv("CANDIDATE_BACKEND") or getenv("EXEC_BACKEND", "ssh")
+    results = get_backend("pool" if backend == "local" else backend).run_many(candidates)
+
+    summary = []
+    for index, result in enumerate(results):
+        metrics = result.get("metrics", {})
+        summary.append({
+            "index": index,
+            "hyperparameters": hyperparameters[index] if hyperparameters else None,
+            "status": result["status"],
+            "returncode": result["returncode"],
+            "wall_time_s": metrics.get("wall_time_s"),
+            "peak_rss_mb": metrics.get("peak_rss_mb"),
+            "final_loss": _final_loss(result["stdout"]),
+            "output_tail": (result["stdout"] + result["stderr"])[-1000:],
+        })
+    # Working runs first, then lowest final loss, then fastest
+    summary.sort(key=lambda r: (
+        r["status"] != "success",
+        r["final_loss"] is None,
+        r["final_loss"] if r["final_loss"] is not None else 0.0,
+        r["wall_time_s"] or 0.0,
+    ))
+    return {"status": "success", "results": summary}
+
+
 def execute_script() -> subprocess.CompletedProcess:
     """
     Executes a script on the environment.
     Returns:
         str: The output from the script execution.
     """
+    res = _run_remote_shell(_run_and_collect_command())
+    res.stdout = _split_log(res.stdout)
+    res.check_returncode()
+    return res
+
+
+async def send_to_env_streaming(
+    content: str,
+    tail_lines: int = 200,
+    max_bytes: int = 20_000,
+    abort_on_traceback: bool = True,
+) -> dict:
+    """
+    Sends code to the environment and runs it, reading its output while it runs.
+    Stops the run as soon as a Python traceback is printed and returns only the
+    last `tail_lines` lines, capped at `max_bytes`.
+    Args:
+        content: The Python code to run.
+        tail_lines: How many of the last output lines to return.
+        max_bytes: Maximum size of the returned output.
+        abort_on_traceback: Kill the run once a traceback has been printed.
+    Returns:
+        dict: status, returncode, stdout (the output tail), stderr, aborted and truncated.
+    """
+    run = ScriptRun(content, abort_on_traceback=abort_on_traceback)
+    tail: deque[str] = deque(maxlen=tail_lines)
+    async for line in run:
+        tail.append(line)
+
+    output = "".join(tail).encode("utf-8")
+    truncated = run.total_bytes > len(output) or len(output) > max_bytes
+    stdout = output[-max_bytes:].decode("utf-8", errors="replace")
+    return {
+        "status": "success" if run.returncode == 0 and not run.aborted else "error",
+        "returncode": run.returncode,
+        "stdout": stdout,
+        "stderr": "",
+        "aborted": run.aborted,
+        "truncated": truncated,
+    }
+
+
+class ScriptRun:
+    """
+    Async iterator over the output lines of a remote run, as they are produced.
+
+        run = ScriptRun(code)
+        async for line in run:
+            ...
+        run.returncode, run.aborted
+
+    The script's stdout/stderr and output.log are merged into one stream.
+    Leaving the loop early (or a traceback, with abort_on_traceback) kills
+    the remote process group.
+    """
+
+    def __init__(self, content: str | None = None, abort_on_traceback: bool = True):
+        self.content = content
+        self.abort_on_traceback = abort_on_traceback
+        self.returncode: int | None = None
+        self.aborted = False
+        self.total_bytes = 0
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        command = _stream_command()
+        if self.content is not None:
+            command = f"cat > {shlex.quote(getenv('REMOTE_FILE', '/path/to/destination/a.py'))} && {command}"
+        proc = await asyncio.create_subprocess_exec(
+            *_shell_args(command),
+            stdin=asyncio.subprocess.PIPE if self.content is not None else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+        )
+        if self.content is not None:
+            try:
+                proc.stdin.write(self.content.encode("utf-8"))
+                await proc.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                # The upload failed and the shell already exited; its status reports the error
+                pass
+            proc.stdin.close()
+
+        traceback = _TracebackDetector()
+        try:
+            async for raw in proc.stdout:
+                self.total_bytes += len(raw)
+                line = raw.decode("utf-8", errors="replace")
+                yield line
+                if self.abort_on_traceback and traceback.feed(line):
+                    self.aborted = True
+                    break
+        finally:
+            if proc.returncode is None and not proc.stdout.at_eof():
+                await _kill_remote_run()
+                proc.kill()
+            self.returncode = await proc.wait()
+
+
+class _TracebackDetector:
+    """Feeds output lines; returns True once a traceback's final exception line is seen"""
+
+    def __init__(self):
+        self.in_traceback = False
+
+    def feed(self, line: str) -> bool:
+        if line.startswith("Traceback (most recent call last):"):
+            self.in_traceback = True
+            return False
+        # Frames are indented; the first unindented line is the exception itself
+        return self.in_traceback and bool(line.strip()) and not line[0].isspace()
+
+
+def close_connections() -> None:
+    """Closes the shared SSH master connection, if one is open."""
+    if _is_local() or _control_persist() == "no":
+        return
+    subprocess.run(['ssh', *_ssh_options(), '-O', 'exit', _remote_host()], capture_output=True, text=True)
+
+
+def _remote_host() -> str:
     user = getenv("REMOTE_USER", "user")
     remote_ip = getenv("REMOTE_IP", "remote")
+    return f'{user}@{remote_ip}'
+
+
+def _is_local() -> bool:
+    # REMOTE_EXEC=local runs the same commands on this machine, as an offline stand-in for the remote host
+    return getenv("REMOTE_EXEC", "ssh") == "local"
+
+
+def _control_persist() -> str:
+    return getenv("SSH_CONTROL_PERSIST", "10m")
+
+
+def _ssh_options() -> list[str]:
+    """
+    ssh/scp options that multiplex every call over one master connection.
+    The first call pays the TCP + key handshake; later ones reuse the socket
+    until it has been idle for SSH_CONTROL_PERSIST (set it to "no" to disable).
+    """
+    persist = _control_persist()
+    if persist == "no":
+        return []
+    control_dir = Path(getenv("SSH_CONTROL_DIR", str(Path.home() / ".ssh" / "sockets")))
+    control_dir.mkdir(parents=True, exist_ok=True)
+    return [
+        '-o', 'ControlMaster=auto',
+        '-o', f'ControlPath={control_dir}/%r@%h:%p',
+        '-o', f'ControlPersist={persist}',
+    ]
+
+
+def _result(returncode: int, stdout: str, stderr: str) -> dict:
+    if returncode != 0:
+        return {
+            "status": "error",
+            "returncode": returncode,
+            "stdout": stdout,
+            "stderr": stderr,
+        }
+    return {
+        "status": "success",
+        "returncode": returncode,
+        "stdout": stdout or "file sent and executed successfully",
+        "stderr": stderr,
+    }
+
+
+def _final_loss(output: str) -> float | None:
+    """Last number printed after the word "loss" in the output, if any"""
+    matches = LOSS_RE.findall(output or "")
+    return float(matches[-1]) if matches else None
+
+
+def _decode(output: bytes | str | None) -> str:
+    if isinstance(output, bytes):
+        return output.decode("utf-8", errors="replace")
+    return output or ""
+
+
+def _run_and_collect_command(measure: bool = False) -> str:
+    """
+    Shell snippet that runs test.sh, then prints the log after a marker line, keeping the exit status.
+    With `measure`, test.sh runs under a small python wrapper that reports its children's rusage on stderr.
+    """
+    remote_path = getenv("REMOTE_PATH", "/path/to/destination/script.sh")
+    script = shlex.quote(f"{remote_path}/test.sh")
+    log = shlex.quote(f"{remote_path}/output.log")
+    run = f"python3 -c {shlex.quote(RUSAGE_WRAPPER)} sh {script}" if measure else f"sh {script}"
+    return f"{{ {run}; status=$?; echo {LOG_MARKER}; cat {log} 2>/dev/null; exit $status; }}"
+
+
+def _isolated_run_command() -> str:
+    """
+    Shell snippet that saves stdin as main.py in a fresh directory under REMOTE_PATH, runs it
+    there with REMOTE_PYTHON under the rusage wrapper and removes the directory, keeping the exit status
+    """
     remote_path = getenv("REMOTE_PATH", "/path/to/destination/script.sh")
-    
-    result = subprocess.run(['ssh', f'{user}@{remote_ip}', 'sh', f'{remote_path}/test.sh'], capture_output=True, text=True, check=True)
-    cat = subprocess.run(['ssh', f'{user}@{remote_ip}', 'cat', f'{remote_path}/output.log'], capture_output=True, text=True, check=True)
-    return cat
\ No newline at end of file
+    template = shlex.quote(f"{remote_path}/candidate-XXXXXX")
+    python = shlex.quote(getenv("REMOTE_PYTHON", "python3"))
+    return (
+        f'dir=$(mktemp -d {template}) && cat > "$dir/main.py" && cd "$dir" && '
+        f'{{ python3 -c {shlex.quote(RUSAGE_WRAPPER)} {python} main.py; status=$?; '
+        f'cd / && rm -rf "$dir"; exit $status; }}'
+    )
+
+
+def _with_hparams(content: str, hparams: dict) -> str:
+    """Defines HPARAMS right after the script's docstring and `from __future__` imports, which must stay first"""
+    line = f"HPARAMS = {hparams!r}\n"
+    try:
+        body = ast.parse(content).body
+    except SyntaxError:
+        # It will fail anyway; keep the script's own error
+        return line + content
+    header_end = 0
+    for index, node in enumerate(body):
+        is_docstring = (
+            index == 0 and isinstance(node, ast.Expr)
+            and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str)
+        )
+        if not (is_docstring or (isinstance(node, ast.ImportFrom) and node.module == "__future__")):
+            break
+        header_end = node.end_lineno
+    lines = content.splitlines(keepends=True)
+    if header_end and not lines[header_end - 1].endswith("\n"):
+        lines[header_end - 1] += "\n"
+    return "".join(lines[:header_end]) + line + "".join(lines[header_end:])
+
+
+def _with_profiler(content: str, top_n: int = 15) -> str:
+    """Wraps a script so it runs under cProfile and prints its top_n hotspots to stderr on exit"""
+    return PROFILE_HARNESS.format(source=repr(content), top_n=top_n, marker=PROFILE_MARKER)
+
+
+def _pop_marker(stderr: str, marker: str) -> tuple[str, Any]:
+    """
+    Removes the `marker + json` line from stderr and returns the decoded payload.
+    A marker line cut short (e.g. the run was killed while writing it) gives no payload.
+    """
+    kept, payload = [], None
+    for line in (stderr or "").splitlines(keepends=True):
+        if line.startswith(marker):
+            try:
+                payload = json.loads(line[len(marker):])
+            except ValueError:
+                payload = None
+            # Drop the blank line written to separate the marker from the script's output
+            if kept and kept[-1] == "\n":
+                kept.pop()
+        else:
+            kept.append(line)
+    return "".join(kept), payload
+
+
+def _log_metrics(metrics: dict) -> None:
+    """Appends the metrics to EXEC_METRICS_LOG (JSON lines), to aggregate them across runs"""
+    path = getenv("EXEC_METRICS_LOG")
+    # A cache hit replays an earlier run's metrics, which were logged when it ran
+    if path and not metrics.get("cached"):
+        with open(path, "a", encoding="utf-8") as log:
+            log.write(json.dumps({"timestamp": time.time(), **metrics}) + "\n")
+
+
+def _split_log(stdout: str) -> str:
+    """The log printed after the marker, or the script's own output when there is no log"""
+    run_output, marker, log = (stdout or "").partition(f"{LOG_MARKER}\n")
+    return log if marker and log else run_output
+
+
+def _stream_command() -> str:
+    """
+    Shell snippet that starts test.sh in its own process group, follows
+    output.log until it exits, and exits with the script's status
+    """
+    remote_path = getenv("REMOTE_PATH", "/path/to/destination/script.sh")
+    script = shlex.quote(f"{remote_path}/test.sh")
+    log = shlex.quote(f"{remote_path}/output.log")
+    pid_file = shlex.quote(f"{remote_path}/run.pid")
+    # Grouped so that a failed upload (`cat > ... &&` in front) or log reset never starts a run
+    return (
+        f": > {log} && {{ setsid sh {script} 2>&1 & pid=$!; echo $pid > {pid_file}; "
+        f"tail -n +1 -f -s 0.2 --pid=$pid {log}; wait $pid; }}"
+    )
+
+
+async def _kill_remote_run() -> None:
+    remote_path = getenv("REMOTE_PATH", "/path/to/destination/script.sh")
+    pid_file = shlex.quote(f"{remote_path}/run.pid")
+    proc = await asyncio.create_subprocess_exec(
+        *_shell_args(f"kill -TERM -- -$(cat {pid_file}) 2>/dev/null"),
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+    await proc.wait()
+
+
+def _shell_args(script: str) -> list[str]:
+    if _is_local():
+        return ['sh', '-c', script]
+    return ['ssh', *_ssh_options(), _remote_host(), script]
+
+
+def _run_remote_shell(script: str, input: str | None = None) -> subprocess.CompletedProcess:
+    return subprocess.run(_shell_args(script), input=input, capture_output=True, text=True)
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEFAULT_CACHE_PATH = Path.home() / ".cache" / "deepresearch" / "crawl_cache.sqlite"
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form of a URL so trivially different spellings share a cache entry"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    path = parts.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    # The fragment never reaches the server, so it is dropped
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+class CrawlCache:
+    """
+    On-disk cache of crawled markdown stored in SQLite.
+
+    Entries are keyed by the normalized URL plus the crawl parameters, expire
+    after `ttl` seconds and are evicted least-recently-used first once the
+    stored markdown exceeds `max_bytes`.
+    """
+
+    def __init__(
+        self,
+        path: Path | str = DEFAULT_CACHE_PATH,
+        ttl: Optional[float] = 7 * 24 * 3600,
+        max_bytes: int = 512 * 1024 * 1024,
+    ):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                markdown TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS pages_accessed ON pages (accessed_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(url: str, **params: Any) -> str:
+        payload = json.dumps({"url": normalize_url(url), "params": params}, sort_keys=True, default=list)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, url: str, **params: Any) -> Optional[str]:
+        key = self.make_key(url, **params)
+        row = self._conn.execute("SELECT markdown, created_at FROM pages WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is None or (self.ttl is not None and now - row[1] > self.ttl):
+            if row is not None:
+                self._conn.execute("DELETE FROM pages WHERE key = ?", (key,))
+                self._conn.commit()
+            self.misses += 1
+            return None
+
+        self._conn.execute("UPDATE pages SET accessed_at = ? WHERE key = ?", (now, key))
+        self._conn.commit()
+        self.hits += 1
+        return row[0]
+
+    def put(self, url: str, markdown: str, **params: Any) -> None:
+        key = self.make_key(url, **params)
+        now = time.time()
+        size = len(markdown.encode("utf-8"))
+        self._conn.execute(
+            "INSERT OR REPLACE INTO pages (key, url, markdown, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, normalize_url(url), markdown, size, now, now),
+        )
+        self._evict()
+        self._conn.commit()
+
+    def size(self) -> int:
+        """Total bytes of markdown currently stored"""
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+
+    def clear(self) -> None:
+        self._conn.execute("DELETE FROM pages")
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def _evict(self) -> None:
+        """Drop expired entries, then least recently used ones until under max_bytes"""
+        if self.ttl is not None:
+            self._conn.execute("DELETE FROM pages WHERE created_at < ?", (time.time() - self.ttl,))
+
+        excess = self.size() - self.max_bytes
+        if excess <= 0:
+            return
+        freed = 0
+        victims = []
+        for key, size in self._conn.execute("SELECT key, size FROM pages ORDER BY accessed_at ASC"):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM pages WHERE key = ?", victims)
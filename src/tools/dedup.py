@@ -0,0 +1,111 @@
+import hashlib
+import re
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, Set
+
+import numpy as np
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+WORD_RE = re.compile(r"\w+")
+
+
+def approx_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)"""
+    return max(1, len(text) // 4) if text else 0
+
+
+class PassageDeduplicator:
+    """
+    Drops exact and near-duplicate passages from a stream.
+
+    Exact duplicates are caught by hashing the normalized text. Near duplicates
+    are caught with MinHash signatures over word shingles, bucketed with LSH
+    banding and confirmed when the estimated Jaccard similarity reaches
+    `threshold`. The first occurrence of a passage is always the one kept.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        num_perm: int = 64,
+        bands: int = 16,
+        shingle_size: int = 5,
+        seed: int = 1,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        # Coefficients below 2**32 keep a * x + b inside uint64 for 32-bit shingle hashes
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(MAX_HASH), size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(MAX_HASH), size=num_perm, dtype=np.uint64)
+
+        self._exact: Set[bytes] = set()
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(bands)]
+        self._signatures: List[np.ndarray] = []
+        self.stats: Dict[str, int] = {
+            "kept_passages": 0,
+            "dropped_exact": 0,
+            "dropped_near": 0,
+            "dropped_tokens": 0,
+        }
+
+    def filter(self, passages: Iterable[Any]) -> Iterator[Any]:
+        """Yield only the passages (objects with a `content` attribute) not seen before"""
+        for passage in passages:
+            if self.is_duplicate(passage.content):
+                self.stats["dropped_tokens"] += approx_tokens(passage.content)
+            else:
+                self.stats["kept_passages"] += 1
+                yield passage
+
+    def is_duplicate(self, text: str) -> bool:
+        """Check text against everything seen so far, remembering it when it is new"""
+        words = WORD_RE.findall(text.lower())
+        digest = hashlib.blake2b(" ".join(words).encode("utf-8"), digest_size=16).digest()
+        if digest in self._exact:
+            self.stats["dropped_exact"] += 1
+            return True
+
+        signature = self._signature(words)
+        band_keys = [
+            signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)
+        ]
+        candidates: Set[int] = set()
+        for band, key in enumerate(band_keys):
+            candidates.update(self._buckets[band].get(key, ()))
+        for candidate in candidates:
+            if np.mean(self._signatures[candidate] == signature) >= self.threshold:
+                self.stats["dropped_near"] += 1
+                return True
+
+        self._exact.add(digest)
+        index = len(self._signatures)
+        self._signatures.append(signature)
+        for band, key in enumerate(band_keys):
+            self._buckets[band].setdefault(key, []).append(index)
+        return False
+
+    def report(self) -> Dict[str, int]:
+        return {**self.stats, "dropped_passages": self.stats["dropped_exact"] + self.stats["dropped_near"]}
+
+    def _signature(self, words: List[str]) -> np.ndarray:
+        size = self.shingle_size
+        if len(words) <= size:
+            shingles = {" ".join(words)}
+        else:
+            shingles = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) for shingle in shingles),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+        # Universal hashing (a * x + b) mod p for every permutation at once
+        permuted = (np.outer(hashes, self._a) + self._b) % MERSENNE_PRIME & MAX_HASH
+        return permuted.min(axis=0)
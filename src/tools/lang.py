@@ -1,11 +1,22 @@
+import asyncio
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Annotated
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Annotated
 from enum import Enum
+from urllib.parse import urlsplit
 from pydantic import BaseModel, Field
 from langgraph.graph import StateGraph, START, END
 from langchain_core.language_models.base import BaseLanguageModel
 from langchain_core.messages import BaseMessage
 
+from tools.crawl_cache import CrawlCache
+from tools.dedup import PassageDeduplicator
+from tools.passage_index import PassageIndex
+from tools.ranker import BM25Ranker
+from tools.semantic_cache import QuestionCache
+from tools.token_budget import TokenBudget, count_tokens
+
+SENTENCE_BREAKS = (". ", "? ", "! ", ".\n", "?\n", "!\n")
+
 
 # Enum definitions
 class ResearchStatus(str, Enum):
@@ -78,15 +89,41 @@ class GraphNode:
         """Report progress during processing"""
         print(f"[{step.upper()}] {message}")
 
+    @staticmethod
+    def _record_tokens(state: ResearchState, step: str, tokens_in: int, tokens_out: int) -> None:
+        """Tokens of passage text entering and leaving a step, in processing_stats["tokens"]"""
+        state.processing_stats.setdefault("tokens", {})[step] = {"in": tokens_in, "out": tokens_out}
+
 
 class PlannerNode(GraphNode):
+    def __init__(
+        self,
+        llm: Optional[BaseLanguageModel] = None,
+        crawler: Optional[Any] = None,
+        question_cache: Optional[QuestionCache] = None,
+    ):
+        super().__init__(llm=llm, crawler=crawler)
+        self.question_cache = question_cache
+
     async def plan(self, state: ResearchState) -> ResearchState:
         self._report_progress("Analyzing research question", "planning")
         
         # Generate sub-questions
         if state.research_question:
-            sub_questions = await self._decompose_question(state.research_question)
-            state.sub_questions = sub_questions
+            question = state.research_question.question
+            cached = self.question_cache.lookup(question) if self.question_cache else None
+            if cached is not None:
+                # A near-identical question was already planned: reuse it without calling the LLM
+                state.sub_questions = [SubQuestion(question=item["text"], parent_question=question) for item in cached]
+                state.processing_stats["planner_cache_hit"] = True
+            else:
+                sub_questions = await self._decompose_question(state.research_question)
+                state.sub_questions = sub_questions
+                if self.question_cache:
+                    self.question_cache.store(
+                        question,
+                        [{"id": f"q{i + 1}", "text": sub.question} for i, sub in enumerate(sub_questions)],
+                    )
         
         self._report_progress(f"Generated {len(state.sub_questions)} sub-questions", "planning")
         return state
@@ -108,43 +145,330 @@ class PlannerNode(GraphNode):
         # Placeholder for parsing logic to create SubQuestion objects
         return []
 class FetcherNode(GraphNode):
+    """Crawls sources concurrently and splits their content into passages"""
+    def __init__(
+        self,
+        llm: Optional[BaseLanguageModel] = None,
+        crawler: Optional[Any] = None,
+        max_concurrency: int = 8,
+        per_host_limit: int = 2,
+        timeout: Optional[float] = 30.0,
+        cache: Optional[CrawlCache] = None,
+        word_count_threshold: int = 10,
+        exclude_tags: Optional[List[str]] = None,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 0,
+        index: Optional[PassageIndex] = None,
+    ):
+        super().__init__(llm=llm, crawler=crawler)
+        self.max_concurrency = max(1, max_concurrency)
+        self.per_host_limit = max(1, per_host_limit)
+        self.timeout = timeout
+        self.cache = cache
+        self.word_count_threshold = word_count_threshold
+        self.exclude_tags = exclude_tags if exclude_tags is not None else ['nav', 'footer', 'aside', 'header']
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.index = index
+
     async def fetch(self, state: ResearchState) -> ResearchState:
         self._report_progress("Starting content extraction", "fetching")
         
-        all_passages = []
-        for source in state.sources:
+        state.passages = [passage async for passage in self.stream(state)]
+        self._record_tokens(state, "fetching", 0, sum(count_tokens(p.content) for p in state.passages))
+        
+        self._report_progress(f"Extracted {len(state.passages)} passages from {len(state.sources)} sources", "fetching")
+        return state
+    
+    async def stream(self, state: ResearchState) -> AsyncIterator[Passage]:
+        """
+        Crawl sources concurrently and yield their passages lazily, in source order.
+        Only the markdown of finished sources is held; passages are built on demand.
+        """
+        hits_before = self.cache.hits if self.cache else 0
+        misses_before = self.cache.misses if self.cache else 0
+        
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        tasks = [
+            asyncio.ensure_future(self._fetch_source(source, semaphore, host_semaphores))
+            for source in state.sources
+        ]
+        
+        fetched, failed = 0, 0
+        try:
+            for source, task in zip(state.sources, tasks):
+                markdown = await task
+                if markdown is None:
+                    failed += 1
+                    continue
+                fetched += 1
+                # Split content into manageable passages
+                indexed = []
+                for passage in self._iter_passages(markdown, source.id):
+                    if self.index is not None:
+                        indexed.append(passage)
+                    yield passage
+                if self.index is not None:
+                    self.index.add(indexed, url=str(source.url))
+        finally:
+            for task in tasks:
+                task.cancel()
+            if self.index is not None:
+                self.index.flush()
+        
+        state.processing_stats["fetched_sources"] = fetched
+        state.processing_stats["failed_sources"] = failed
+        if self.cache:
+            state.processing_stats["cache_hits"] = self.cache.hits - hits_before
+            state.processing_stats["cache_misses"] = self.cache.misses - misses_before
+    
+    async def _fetch_source(
+        self,
+        source: Source,
+        semaphore: asyncio.Semaphore,
+        host_semaphores: Dict[str, asyncio.Semaphore],
+    ) -> Optional[str]:
+        """Markdown of a single source, crawled under the global and per-host limits, None on failure"""
+        crawl_params = {
+            "word_count_threshold": self.word_count_threshold,
+            "exclude_tags": self.exclude_tags,
+        }
+        if self.cache:
+            markdown = self.cache.get(str(source.url), **crawl_params)
+            if markdown is not None:
+                return markdown
+        
+        if not self.crawler:
+            return None
+        
+        host = urlsplit(str(source.url)).netloc.lower()
+        host_semaphore = host_semaphores.setdefault(host, asyncio.Semaphore(self.per_host_limit))
+        
+        # Take the host slot first so queued same-host sources do not hold global slots
+        async with host_semaphore, semaphore:
             try:
                 # Extract clean content using Crawl4AI
-                if self.crawler:
-                    result = await self.crawler.arun(
+                result = await asyncio.wait_for(
+                    self.crawler.arun(
                         url=str(source.url),
-                        word_count_threshold=10,
-                        exclude_tags=['nav', 'footer', 'aside', 'header'],
                         remove_overlay_elements=True,
-                    )
-                    
-                    if result.success and result.markdown:
-                        # Split content into manageable passages
-                        passages = self._split_into_passages(result.markdown, source.id)
-                        all_passages.extend(passages)
+                        **crawl_params,
+                    ),
+                    timeout=self.timeout,
+                )
             except Exception:
-                continue  # Skip failed sources
+                return None  # Skip failed or timed out sources
         
-        state.passages = all_passages
-        return state
+        if not (result.success and result.markdown):
+            return None
+        markdown = str(result.markdown)
+        if self.cache:
+            self.cache.put(str(source.url), markdown, **crawl_params)
+        return markdown
     
-    def _split_into_passages(self, content: str, source_id: str, chunk_size: int = 1000) -> List[Passage]:
+    def _split_into_passages(self, content: str, source_id: str, chunk_size: Optional[int] = None) -> List[Passage]:
         """Split content into manageable passage chunks"""
-        passages = []
-        chunks = [content[i:i+chunk_size] for i in range(0, len(content), chunk_size)]
-        
-        for idx, chunk in enumerate(chunks):
-            passage = Passage(
-                id=f"{source_id}_chunk_{idx}",
-                source_id=source_id,
-                content=chunk,
-                page_num=idx
-            )
-            passages.append(passage)
-        
-        return passages
\ No newline at end of file
+        return list(self._iter_passages(content, source_id, chunk_size=chunk_size))
+    
+    def _iter_passages(
+        self,
+        content: str,
+        source_id: str,
+        chunk_size: Optional[int] = None,
+        overlap: Optional[int] = None,
+    ) -> Iterator[Passage]:
+        """Lazily yield passages of at most chunk_size characters, cut at paragraph or sentence boundaries"""
+        chunk_size = chunk_size or self.chunk_size
+        overlap = min(self.chunk_overlap if overlap is None else overlap, chunk_size // 2)
+        
+        idx = 0
+        start = 0
+        length = len(content)
+        while start < length:
+            end = min(start + chunk_size, length)
+            if end < length:
+                end = self._find_boundary(content, start, end)
+            
+            chunk = content[start:end]
+            if chunk.strip():
+                yield Passage(
+                    id=f"{source_id}_chunk_{idx}",
+                    source_id=source_id,
+                    content=chunk,
+                    page_num=idx
+                )
+                idx += 1
+            if end >= length:
+                break
+            
+            # Step back by the overlap, then forward to the next word start
+            next_start = end - overlap
+            if overlap:
+                space = content.find(" ", next_start, end)
+                if space != -1:
+                    next_start = space + 1
+            start = next_start if next_start > start else end
+    
+    @staticmethod
+    def _find_boundary(content: str, start: int, end: int) -> int:
+        """Best cut position in content[start:end], preferring paragraphs, then sentences, then words"""
+        floor = start + (end - start) // 2
+        paragraph = content.rfind("\n\n", floor, end)
+        if paragraph != -1:
+            return paragraph + 2
+        sentence = max(content.rfind(mark, floor, end) for mark in SENTENCE_BREAKS)
+        if sentence != -1:
+            return sentence + 2
+        word = max(content.rfind(" ", floor, end), content.rfind("\n", floor, end))
+        if word != -1:
+            return word + 1
+        return end
+
+
+class DedupNode(GraphNode):
+    """Removes exact and near-duplicate passages before they reach the writer"""
+    def __init__(self, threshold: float = 0.8, num_perm: int = 64, bands: int = 16, shingle_size: int = 5):
+        super().__init__()
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle_size = shingle_size
+    
+    async def dedup(self, state: ResearchState) -> ResearchState:
+        self._report_progress(f"Deduplicating {len(state.passages)} passages", "dedup")
+        
+        deduplicator = self._make_deduplicator()
+        tokens_in = sum(count_tokens(p.content) for p in state.passages)
+        state.passages = list(deduplicator.filter(state.passages))
+        self._record_tokens(state, "dedup", tokens_in, sum(count_tokens(p.content) for p in state.passages))
+        
+        report = deduplicator.report()
+        state.processing_stats["dedup"] = report
+        self._report_progress(
+            f"Dropped {report['dropped_passages']} passages (~{report['dropped_tokens']} tokens)", "dedup"
+        )
+        return state
+    
+    def _make_deduplicator(self) -> PassageDeduplicator:
+        return PassageDeduplicator(
+            threshold=self.threshold,
+            num_perm=self.num_perm,
+            bands=self.bands,
+            shingle_size=self.shingle_size,
+        )
+
+
+class RankerNode(GraphNode):
+    """Keeps the top-k passages per sub-question using a local BM25 ranking"""
+    def __init__(self, top_k: int = 5, k1: float = 1.5, b: float = 0.75):
+        super().__init__()
+        self.top_k = top_k
+        self.k1 = k1
+        self.b = b
+    
+    async def rank(self, state: ResearchState) -> ResearchState:
+        queries = [sq.question for sq in state.sub_questions]
+        if not queries and state.research_question:
+            queries = [state.research_question.question]
+        if not queries or not state.passages:
+            return state
+        
+        self._report_progress(f"Ranking {len(state.passages)} passages for {len(queries)} questions", "ranking")
+        
+        ranker = BM25Ranker(k1=self.k1, b=self.b).fit([p.content for p in state.passages])
+        scores = ranker.score(queries)
+        top = ranker.top_k(scores, self.top_k)
+        
+        # Union of every question's top-k, ordered by the best score each passage got
+        best = scores.max(axis=0)
+        selected = sorted({i for indices in top for i in indices}, key=lambda i: -best[i])
+        if not selected:
+            # Nothing to choose from (top_k <= 0): keep the passages instead of dropping them all
+            selected = list(range(len(state.passages)))
+        
+        source_scores: Dict[str, float] = {}
+        for i in selected:
+            source_id = state.passages[i].source_id
+            source_scores[source_id] = max(source_scores.get(source_id, 0.0), float(best[i]))
+        for source in state.sources:
+            source.relevance_score = source_scores.get(source.id, 0.0)
+        
+        state.processing_stats["ranking"] = {
+            "top_k": self.top_k,
+            "candidates": len(state.passages),
+            "selected": len(selected),
+            "per_question": {
+                query: [state.passages[i].id for i in indices] for query, indices in zip(queries, top)
+            },
+        }
+        tokens_in = sum(count_tokens(p.content) for p in state.passages)
+        state.passages = [state.passages[i] for i in selected]
+        self._record_tokens(state, "ranking", tokens_in, sum(count_tokens(p.content) for p in state.passages))
+        
+        self._report_progress(f"Selected {len(selected)} passages", "ranking")
+        return state
+
+
+class BudgetNode(GraphNode):
+    """Packs the best passages per sub-question into a fixed token budget for the writer prompt"""
+    def __init__(self, per_question_tokens: int = 2000, total_tokens: Optional[int] = None, k1: float = 1.5, b: float = 0.75):
+        super().__init__()
+        self.per_question_tokens = per_question_tokens
+        self.total_tokens = total_tokens
+        self.k1 = k1
+        self.b = b
+    
+    async def budget(self, state: ResearchState) -> ResearchState:
+        queries = [sq.question for sq in state.sub_questions]
+        if not queries and state.research_question:
+            queries = [state.research_question.question]
+        if not queries or not state.passages:
+            return state
+        
+        texts = [p.content for p in state.passages]
+        scores = BM25Ranker(k1=self.k1, b=self.b).fit(texts).score(queries)
+        packed = TokenBudget(per_question=self.per_question_tokens, total=self.total_tokens).pack(scores, texts)
+        
+        state.processing_stats["budget"] = {
+            "per_question_tokens": self.per_question_tokens,
+            "total_tokens": self.total_tokens,
+            "selected": len(packed["selected"]),
+            "candidates": len(texts),
+            "per_question": dict(zip(queries, packed["tokens_per_question"])),
+        }
+        self._record_tokens(state, "budget", packed["candidate_tokens"], packed["tokens"])
+        state.passages = [state.passages[i] for i in packed["selected"]]
+        
+        self._report_progress(
+            f"Packed {len(state.passages)} passages into {packed['tokens']} of {packed['candidate_tokens']} tokens",
+            "budget",
+        )
+        return state
+
+
+class RecallNode(GraphNode):
+    """Answers sub-questions from passages fetched in earlier runs, without crawling"""
+    def __init__(self, index: PassageIndex, top_k: int = 5):
+        super().__init__()
+        self.index = index
+        self.top_k = top_k
+    
+    async def recall(self, state: ResearchState) -> ResearchState:
+        queries = [sq.question for sq in state.sub_questions]
+        if not queries and state.research_question:
+            queries = [state.research_question.question]
+        
+        known = {p.id for p in state.passages}
+        recalled = 0
+        for query in queries:
+            for hit in self.index.search(query, top_k=self.top_k):
+                if hit["id"] in known:
+                    continue
+                known.add(hit["id"])
+                state.passages.append(Passage(id=hit["id"], source_id=hit["source_id"], content=hit["content"]))
+                recalled += 1
+        
+        state.processing_stats["recalled_passages"] = recalled
+        self._report_progress(f"Recalled {recalled} passages from the index", "recall")
+        return state
@@ -0,0 +1,227 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from os import getenv
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest, LlmResponse
+from google.genai.types import GenerateContentConfig
+from pydantic import BaseModel
+
+DEFAULT_LLM_CACHE_PATH = Path.home() / ".cache" / "deepresearch" / "llm_cache.sqlite"
+
+
+# Config fields that change how the request is sent, not what the model answers
+TRANSPORT_CONFIG_FIELDS = {"http_options", "should_return_http_response", "labels"}
+
+
+def request_fingerprint(llm_request: LlmRequest) -> str:
+    """
+    Hash of everything that determines the model's answer: model, contents and
+    the whole generation config (instruction, sampling parameters, response
+    schema and tool declarations) minus its transport fields.
+    """
+    payload = {
+        "model": llm_request.model,
+        "config": _config_payload(llm_request.config),
+        "contents": [content.model_dump(mode="json", exclude_none=True) for content in llm_request.contents],
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def _config_payload(config: Optional[GenerateContentConfig]) -> Optional[Dict[str, Any]]:
+    if config is None:
+        return None
+    dumped = config.model_dump(exclude_none=True, exclude=TRANSPORT_CONFIG_FIELDS)
+    schema = dumped.get("response_schema")
+    # output_schema arrives as the pydantic class itself; hash its JSON schema, not its repr
+    if isinstance(schema, type) and issubclass(schema, BaseModel):
+        dumped["response_schema"] = schema.model_json_schema()
+    return dumped
+
+
+class LLMResponseCache:
+    """
+    On-disk cache of final model responses stored in SQLite.
+
+    Entries are keyed by `request_fingerprint`, expire after `ttl` seconds and
+    are evicted least-recently-used first once the stored responses exceed
+    `max_bytes`. `before_model` / `after_model` plug it into any LlmAgent as
+    ADK model callbacks; a hit skips the model call entirely.
+    """
+
+    _default: "LLMResponseCache | None" = None
+
+    def __init__(
+        self,
+        path: Path | str = DEFAULT_LLM_CACHE_PATH,
+        ttl: Optional[float] = 7 * 24 * 3600,
+        max_bytes: int = 128 * 1024 * 1024,
+    ):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # Key and model of requests sent to the model, waiting for their response or error
+        self._pending: Dict[Tuple[str, str], Tuple[str, str]] = {}
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+        self._conn.commit()
+
+    @classmethod
+    def default(cls) -> "LLMResponseCache":
+        if cls._default is None:
+            ttl = getenv("LLM_CACHE_TTL")
+            cls._default = cls(
+                getenv("LLM_CACHE_PATH", str(DEFAULT_LLM_CACHE_PATH)),
+                ttl=float(ttl) if ttl else 7 * 24 * 3600,
+            )
+        return cls._default
+
+    def get(self, key: str) -> Optional[LlmResponse]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or (self.ttl is not None and now - row[1] > self.ttl):
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return LlmResponse.model_validate_json(row[0])
+
+    def put(self, key: str, response: LlmResponse, model: Optional[str] = None) -> None:
+        payload = response.model_dump_json(exclude_none=True)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, payload, len(payload), now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def before_model(self, callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[LlmResponse]:
+        key = request_fingerprint(llm_request)
+        cached = self.get(key)
+        if cached is None:
+            self._pending[(callback_context.invocation_id, callback_context.agent_name)] = (key, llm_request.model)
+        return cached
+
+    def after_model(self, callback_context: CallbackContext, llm_response: LlmResponse) -> Optional[LlmResponse]:
+        # Streaming chunks and errors are not cached, only the final answer
+        if llm_response.partial:
+            return None
+        pending = self._pending.pop((callback_context.invocation_id, callback_context.agent_name), None)
+        if pending is not None and llm_response.content is not None and not llm_response.error_code:
+            key, model = pending
+            self.put(key, llm_response, model=model)
+        return None
+
+    def on_model_error(
+        self, callback_context: CallbackContext, llm_request: LlmRequest, error: Exception
+    ) -> Optional[LlmResponse]:
+        """The model raised instead of answering: forget the request so `_pending` does not grow"""
+        self._pending.pop((callback_context.invocation_id, callback_context.agent_name), None)
+        return None
+
+    def _evict(self) -> None:
+        """Drop expired entries, then least recently used ones until under max_bytes"""
+        if self.ttl is not None:
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+
+
+def llm_cache_callbacks(cache: Optional[LLMResponseCache] = None) -> Dict[str, Any]:
+    """
+    Keyword arguments that enable the response cache on an LlmAgent:
+    `LlmAgent(..., **llm_cache_callbacks())`. Empty when LLM_CACHE=off.
+    Without `cache`, the default cache is only opened on the first model call,
+    so agent modules can call this at import time.
+    """
+    if cache is not None:
+        return {
+            "before_model_callback": cache.before_model,
+            "after_model_callback": cache.after_model,
+            "on_model_error_callback": cache.on_model_error,
+        }
+    if getenv("LLM_CACHE", "on") == "off":
+        return {}
+    return {
+        "before_model_callback": _default_before_model,
+        "after_model_callback": _default_after_model,
+        "on_model_error_callback": _default_on_model_error,
+    }
+
+
+def _default_before_model(callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[LlmResponse]:
+    return LLMResponseCache.default().before_model(callback_context, llm_request)
+
+
+def _default_after_model(callback_context: CallbackContext, llm_response: LlmResponse) -> Optional[LlmResponse]:
+    return LLMResponseCache.default().after_model(callback_context, llm_response)
+
+
+def _default_on_model_error(
+    callback_context: CallbackContext, llm_request: LlmRequest, error: Exception
+) -> Optional[LlmResponse]:
+    return LLMResponseCache.default().on_model_error(callback_context, llm_request, error)
+
+
+def combine_callbacks(*callback_sets: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Merges several `llm_cache_callbacks()`-style dicts into lists ADK runs in
+    order; the first before_model callback that returns a response wins.
+    """
+    combined: Dict[str, List[Any]] = {}
+    for callbacks in callback_sets:
+        for name, callback in callbacks.items():
+            combined.setdefault(name, []).extend(callback if isinstance(callback, list) else [callback])
+    return combined
@@ -0,0 +1,280 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from tools.ranker import tokenize
+
+DEFAULT_INDEX_DIR = Path.home() / ".cache" / "deepresearch" / "passage_index"
+MANIFEST = "manifest.json"
+
+
+class PassageIndex:
+    """
+    Persistent, append-only inverted index over fetched passages.
+
+    Passage text lives in a SQLite table (deduplicated by content hash). The
+    postings are written in immutable segments: a JSON term dictionary plus
+    `.npy` arrays of document ids and term frequencies that are opened with
+    `mmap_mode="r"`, so a query only pages in the postings of its own terms.
+    New passages are buffered and written as a new segment on `flush()`;
+    `compact()` merges all segments into one.
+
+    The manifest records the last doc id covered by a segment. Passage rows
+    are committed before their postings reach a segment, so rows past that id
+    (left by a crash or an unflushed close) are re-indexed on open. One
+    instance may be shared between threads; use `default()` instead of
+    opening the same directory twice in a process.
+    """
+
+    _default: "PassageIndex | None" = None
+
+    def __init__(self, directory: Path | str = DEFAULT_INDEX_DIR, flush_every: int = 50_000):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.flush_every = flush_every
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.directory / "passages.sqlite", check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS passages (
+                doc_id INTEGER PRIMARY KEY,
+                content_hash TEXT UNIQUE NOT NULL,
+                passage_id TEXT NOT NULL,
+                source_id TEXT NOT NULL,
+                url TEXT,
+                content TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+        manifest = self.directory / MANIFEST
+        stored = json.loads(manifest.read_text()) if manifest.exists() else {}
+        self._segments: List[str] = stored.get("segments", [])
+        self._opened: Dict[str, Tuple[Dict[str, List[int]], np.ndarray, np.ndarray]] = {}
+        self._buffer: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self._buffered_docs = 0
+        self._indexed_through: int = stored.get("indexed_through", self._max_segment_doc_id())
+        self._last_doc_id = self._indexed_through
+        self._reindex_missing()
+
+    @classmethod
+    def default(cls) -> "PassageIndex":
+        if cls._default is None:
+            cls._default = cls(os.getenv("PASSAGE_INDEX_DIR", str(DEFAULT_INDEX_DIR)))
+        return cls._default
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM passages").fetchone()[0]
+
+    def add(self, passages: Iterable[Any], url: Optional[str] = None) -> int:
+        """Index passages (objects with id, source_id and content), returns how many were new"""
+        added = 0
+        with self._lock:
+            for passage in passages:
+                content_hash = hashlib.sha1(passage.content.encode("utf-8")).hexdigest()
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO passages (content_hash, passage_id, source_id, url, content) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (content_hash, passage.id, passage.source_id, url, passage.content),
+                )
+                if not cursor.rowcount:
+                    continue
+                self._buffer_postings(cursor.lastrowid, passage.content)
+                added += 1
+                if self._buffered_docs >= self.flush_every:
+                    self.flush()
+            self._conn.commit()
+        return added
+
+    def flush(self) -> None:
+        """Write buffered postings as a new immutable segment"""
+        with self._lock:
+            self._conn.commit()
+            if not self._buffer:
+                return
+            name = self._next_segment_name()
+            self._write_segment(name, self._buffer)
+            self._segments.append(name)
+            self._indexed_through = self._last_doc_id
+            self._write_manifest()
+            self._buffer = defaultdict(list)
+            self._buffered_docs = 0
+
+    def compact(self) -> None:
+        """Merge every segment into a single one to keep query cost independent of history"""
+        with self._lock:
+            self.flush()
+            if len(self._segments) <= 1:
+                return
+            segments = [self._open(name) for name in self._segments]
+            vocabulary = sorted(set().union(*(terms for terms, _, _ in segments)))
+            total = sum(len(doc_ids) for _, doc_ids, _ in segments)
+
+            old = self._segments
+            name = self._next_segment_name()
+            # Doc ids grow with every segment, so concatenating per term keeps postings sorted
+            doc_out = np.lib.format.open_memmap(
+                self.directory / f"{name}.docs.npy", mode="w+", dtype=np.int64, shape=(total,)
+            )
+            tf_out = np.lib.format.open_memmap(
+                self.directory / f"{name}.tfs.npy", mode="w+", dtype=np.int32, shape=(total,)
+            )
+            merged: Dict[str, List[int]] = {}
+            position = 0
+            for term in vocabulary:
+                start = position
+                for terms, doc_ids, tfs in segments:
+                    if term in terms:
+                        offset, count = terms[term]
+                        doc_out[position:position + count] = doc_ids[offset:offset + count]
+                        tf_out[position:position + count] = tfs[offset:offset + count]
+                        position += count
+                merged[term] = [start, position - start]
+            doc_out.flush()
+            tf_out.flush()
+            del doc_out, tf_out
+            (self.directory / f"{name}.terms.json").write_text(json.dumps(merged))
+
+            self._segments = [name]
+            self._write_manifest()
+            self._opened.clear()
+            for stale in old:
+                for suffix in (".terms.json", ".docs.npy", ".tfs.npy"):
+                    (self.directory / f"{stale}{suffix}").unlink(missing_ok=True)
+
+    def search(self, query: str, top_k: int = 10) -> List[Dict[str, Any]]:
+        """Passages best matching the query keywords, scored with tf-idf"""
+        with self._lock:
+            self.flush()
+            terms = set(tokenize(query))
+            total = len(self)
+            if not terms or not total:
+                return []
+
+            doc_chunks, weight_chunks = [], []
+            for term in terms:
+                postings = []
+                for name in self._segments:
+                    terms_dict, doc_ids, tfs = self._open(name)
+                    if term in terms_dict:
+                        offset, count = terms_dict[term]
+                        postings.append((doc_ids[offset:offset + count], tfs[offset:offset + count]))
+                df = sum(len(ids) for ids, _ in postings)
+                if not df:
+                    continue
+                idf = np.log1p(total / df)
+                for ids, tf in postings:
+                    doc_chunks.append(np.asarray(ids))
+                    weight_chunks.append((1.0 + np.log(np.asarray(tf, dtype=np.float64))) * idf)
+            if not doc_chunks:
+                return []
+
+            doc_ids, inverse = np.unique(np.concatenate(doc_chunks), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(weight_chunks))
+            k = min(top_k, len(doc_ids))
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best], kind="stable")]
+            return self._load(doc_ids[best].tolist(), scores[best].tolist())
+
+    def close(self) -> None:
+        with self._lock:
+            self.flush()
+            self._conn.close()
+        if PassageIndex._default is self:
+            PassageIndex._default = None
+
+    def _buffer_postings(self, doc_id: int, content: str) -> None:
+        for term, tf in Counter(tokenize(content)).items():
+            self._buffer[term].append((doc_id, tf))
+        self._buffered_docs += 1
+        self._last_doc_id = max(self._last_doc_id, doc_id)
+
+    def _reindex_missing(self) -> None:
+        """Buffer the postings of rows committed after the last segment was written"""
+        rows = self._conn.execute(
+            "SELECT doc_id, content FROM passages WHERE doc_id > ? ORDER BY doc_id", (self._indexed_through,)
+        )
+        for doc_id, content in rows:
+            self._buffer_postings(doc_id, content)
+        if self._buffer:
+            self.flush()
+
+    def _max_segment_doc_id(self) -> int:
+        """Last indexed doc id for manifests written before `indexed_through` was recorded"""
+        last = 0
+        for name in self._segments:
+            _, doc_ids, _ = self._open(name)
+            if len(doc_ids):
+                last = max(last, int(doc_ids.max()))
+        return last
+
+    def _load(self, doc_ids: List[int], scores: List[float]) -> List[Dict[str, Any]]:
+        placeholders = ",".join("?" * len(doc_ids))
+        rows = {
+            row[0]: row[1:]
+            for row in self._conn.execute(
+                f"SELECT doc_id, passage_id, source_id, url, content FROM passages WHERE doc_id IN ({placeholders})",
+                doc_ids,
+            )
+        }
+        results = []
+        for doc_id, score in zip(doc_ids, scores):
+            passage_id, source_id, url, content = rows[doc_id]
+            results.append({"id": passage_id, "source_id": source_id, "url": url, "content": content, "score": score})
+        return results
+
+    def _next_segment_name(self) -> str:
+        last = int(self._segments[-1].split("_")[1]) if self._segments else -1
+        return f"seg_{last + 1:05d}"
+
+    def _open(self, name: str) -> Tuple[Dict[str, List[int]], np.ndarray, np.ndarray]:
+        if name not in self._opened:
+            terms = json.loads((self.directory / f"{name}.terms.json").read_text())
+            doc_ids = np.load(self.directory / f"{name}.docs.npy", mmap_mode="r")
+            tfs = np.load(self.directory / f"{name}.tfs.npy", mmap_mode="r")
+            self._opened[name] = (terms, doc_ids, tfs)
+        return self._opened[name]
+
+    def _write_segment(self, name: str, postings: Dict[str, List[Tuple[int, int]]]) -> None:
+        terms: Dict[str, List[int]] = {}
+        doc_ids: List[int] = []
+        tfs: List[int] = []
+        for term in sorted(postings):
+            entries = sorted(postings[term])
+            terms[term] = [len(doc_ids), len(entries)]
+            doc_ids.extend(doc_id for doc_id, _ in entries)
+            tfs.extend(tf for _, tf in entries)
+        np.save(self.directory / f"{name}.docs.npy", np.asarray(doc_ids, dtype=np.int64))
+        np.save(self.directory / f"{name}.tfs.npy", np.asarray(tfs, dtype=np.int32))
+        (self.directory / f"{name}.terms.json").write_text(json.dumps(terms))
+
+    def _write_manifest(self) -> None:
+        tmp = self.directory / f"{MANIFEST}.tmp"
+        tmp.write_text(json.dumps({"segments": self._segments, "indexed_through": self._indexed_through}))
+        os.replace(tmp, self.directory / MANIFEST)
+
+
+def search_passages(query: str, top_k: int = 10) -> dict:
+    """
+    Searches passages fetched in previous research runs by keywords.
+    Args:
+        query: Keywords to look for.
+        top_k: Maximum number of passages to return.
+    Returns:
+        dict: status and the matching passages with their source url and score.
+    """
+    try:
+        return {"status": "success", "results": PassageIndex.default().search(query, top_k=top_k)}
+    except Exception as e:
+        return {"status": "error", "results": [], "error": str(e)}
@@ -0,0 +1,91 @@
+import json
+import sqlite3
+import threading
+from os import getenv
+from pathlib import Path
+from typing import Any, Dict, Iterable, List
+
+DEFAULT_PAYLOAD_PATH = Path.home() / ".cache" / "deepresearch" / "payloads.sqlite"
+
+
+class PayloadStore:
+    """
+    Side store for large research-state payloads (passages, sources).
+
+    Items are JSON blobs in a SQLite table, grouped by session and field, and
+    referenced from session state by their integer handle. Session state then
+    only carries handles, so the session service never copies or serializes
+    the fetched text itself.
+    """
+
+    _default: "PayloadStore | None" = None
+
+    def __init__(self, path: Path | str = DEFAULT_PAYLOAD_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS payloads (
+                handle INTEGER PRIMARY KEY,
+                session_id TEXT NOT NULL,
+                field TEXT NOT NULL,
+                body BLOB NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS payloads_session ON payloads (session_id, field, handle)")
+        self._conn.commit()
+
+    @classmethod
+    def default(cls) -> "PayloadStore":
+        if cls._default is None:
+            cls._default = cls(getenv("PAYLOAD_STORE_PATH", str(DEFAULT_PAYLOAD_PATH)))
+        return cls._default
+
+    def put_many(self, session_id: str, field: str, items: Iterable[Dict[str, Any]]) -> List[int]:
+        handles = []
+        with self._lock:
+            for item in items:
+                cursor = self._conn.execute(
+                    "INSERT INTO payloads (session_id, field, body) VALUES (?, ?, ?)",
+                    (session_id, field, json.dumps(item).encode("utf-8")),
+                )
+                handles.append(cursor.lastrowid)
+            self._conn.commit()
+        return handles
+
+    def get_many(self, handles: List[int]) -> List[Dict[str, Any]]:
+        """Items for the given handles, in the same order"""
+        if not handles:
+            return []
+        placeholders = ",".join("?" * len(handles))
+        with self._lock:
+            rows = dict(
+                self._conn.execute(f"SELECT handle, body FROM payloads WHERE handle IN ({placeholders})", handles)
+            )
+        return [json.loads(rows[handle]) for handle in handles]
+
+    def count(self, session_id: str, field: str) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM payloads WHERE session_id = ? AND field = ?", (session_id, field)
+            ).fetchone()[0]
+
+    def delete_many(self, handles: List[int]) -> None:
+        if not handles:
+            return
+        placeholders = ",".join("?" * len(handles))
+        with self._lock:
+            self._conn.execute(f"DELETE FROM payloads WHERE handle IN ({placeholders})", handles)
+            self._conn.commit()
+
+    def delete_session(self, session_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM payloads WHERE session_id = ?", (session_id,))
+            self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
@@ -1,10 +1,97 @@
-from langsmith import Client
-from langchain_google_genai import ChatGoogleGenerativeAI
+import json
+import time
+from functools import lru_cache
+from os import getenv
+from pathlib import Path
+from typing import Any, Dict, Optional
+
 from dotenv import load_dotenv
+
 load_dotenv()
-from os import getenv
 
-client = Client(api_key=getenv("LANGSMITH_API_KEY"))
-model = ChatGoogleGenerativeAI(model="gemini-2.0")
-prompt = client.pull_prompt("deepresearch", include_model=True)
-print(prompt)
\ No newline at end of file
+DEFAULT_PROMPT_DIR = Path.home() / ".cache" / "deepresearch" / "prompts"
+LATEST = "latest"
+
+
+class PromptRegistry:
+    """
+    LangSmith prompts loaded on first use and kept on disk.
+
+    Each pulled prompt is stored as `<directory>/<name>/<version>.json`. A
+    pinned version (a LangSmith commit hash) never changes, so once on disk it
+    is never pulled again; "latest" is re-pulled after `ttl` seconds. When the
+    pull fails (offline, no API key), the last stored copy is used instead.
+    """
+
+    def __init__(self, directory: Path | str = DEFAULT_PROMPT_DIR, ttl: Optional[float] = 24 * 3600):
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self._client = None
+        self._loaded: Dict[str, Any] = {}
+
+    def get(self, name: str, version: str = LATEST) -> Any:
+        key = f"{name}:{version}"
+        if key not in self._loaded:
+            self._loaded[key] = self._load(name, version)
+        return self._loaded[key]
+
+    def _load(self, name: str, version: str) -> Any:
+        from langchain_core.load import load
+
+        path = self.directory / name / f"{version}.json"
+        stored = json.loads(path.read_text()) if path.exists() else None
+        fresh = stored is not None and (
+            version != LATEST or self.ttl is None or time.time() - stored["pulled_at"] < self.ttl
+        )
+        if not fresh:
+            try:
+                stored = self._pull(name, version)
+            except Exception:
+                if stored is None:
+                    raise RuntimeError(f"Prompt {name}:{version} could not be pulled and has no local copy") from None
+            else:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_suffix(".tmp")
+                tmp.write_text(json.dumps(stored))
+                tmp.replace(path)
+        return load(stored["prompt"])
+
+    def _pull(self, name: str, version: str) -> Dict[str, Any]:
+        from langchain_core.load import dumpd
+
+        identifier = name if version == LATEST else f"{name}:{version}"
+        prompt = self._langsmith().pull_prompt(identifier)
+        return {"name": name, "version": version, "pulled_at": time.time(), "prompt": dumpd(prompt)}
+
+    def _langsmith(self) -> Any:
+        if self._client is None:
+            from langsmith import Client
+
+            self._client = Client(api_key=getenv("LANGSMITH_API_KEY"))
+        return self._client
+
+
+@lru_cache(maxsize=None)
+def get_registry() -> PromptRegistry:
+    return PromptRegistry(getenv("PROMPT_CACHE_DIR", str(DEFAULT_PROMPT_DIR)))
+
+
+@lru_cache(maxsize=None)
+def get_model() -> Any:
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    return ChatGoogleGenerativeAI(model="gemini-2.0")
+
+
+def get_prompt(name: str = "deepresearch", version: Optional[str] = None) -> Any:
+    """Prompt `name`, pinned with PROMPT_VERSION / `version` or the latest one"""
+    return get_registry().get(name, version or getenv("PROMPT_VERSION") or LATEST)
+
+
+def get_chain(name: str = "deepresearch", version: Optional[str] = None) -> Any:
+    """Prompt piped into the local model"""
+    return get_prompt(name, version) | get_model()
+
+
+if __name__ == "__main__":
+    print(get_prompt())
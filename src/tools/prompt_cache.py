@@ -0,0 +1,100 @@
+import threading
+from os import getenv
+from typing import Any, Dict, Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmResponse
+
+STATE_KEY = "prompt_cache"
+
+
+class PromptCacheStats:
+    """
+    Prompt tokens served from a provider-side cache versus prefilled fresh, per agent.
+
+    Fed by an ADK after_model callback from the response usage metadata:
+    Gemini reports `cached_content_token_count` for context-cache hits.
+    Responses without that count are skipped. Ollama reuses its KV cache
+    without reporting it, so the callbacks belong on Gemini agents only;
+    on an Ollama agent every prompt token would show up as fresh. Each
+    agent's running totals are also written to session state under
+    `prompt_cache:<agent>`.
+    """
+
+    _default: "PromptCacheStats | None" = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._agents: Dict[str, Dict[str, int]] = {}
+
+    @classmethod
+    def default(cls) -> "PromptCacheStats":
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    def record(self, agent: str, prompt_tokens: int, cached_tokens: int) -> Dict[str, Any]:
+        with self._lock:
+            totals = self._agents.setdefault(agent, {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0})
+            totals["calls"] += 1
+            totals["prompt_tokens"] += prompt_tokens
+            totals["cached_tokens"] += cached_tokens
+            return self._summary(totals)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {agent: self._summary(totals) for agent, totals in self._agents.items()}
+
+    def after_model(self, callback_context: CallbackContext, llm_response: LlmResponse) -> Optional[LlmResponse]:
+        usage = llm_response.usage_metadata
+        if llm_response.partial or usage is None or not usage.prompt_token_count:
+            return None
+        if usage.cached_content_token_count is None:
+            # The provider does not report cache hits, a 0 here would be misleading
+            return None
+        summary = self.record(callback_context.agent_name, usage.prompt_token_count, usage.cached_content_token_count)
+        callback_context.state[f"{STATE_KEY}:{callback_context.agent_name}"] = summary
+        return None
+
+    @staticmethod
+    def _summary(totals: Dict[str, int]) -> Dict[str, Any]:
+        fresh = totals["prompt_tokens"] - totals["cached_tokens"]
+        return {
+            **totals,
+            "fresh_tokens": fresh,
+            "cached_ratio": totals["cached_tokens"] / totals["prompt_tokens"] if totals["prompt_tokens"] else 0.0,
+        }
+
+
+def prompt_cache_callbacks(stats: Optional[PromptCacheStats] = None) -> Dict[str, Any]:
+    """Keyword arguments that record cached vs fresh prompt tokens of a Gemini LlmAgent"""
+    return {"after_model_callback": (stats or PromptCacheStats.default()).after_model}
+
+
+def ollama_cache_options() -> Dict[str, Any]:
+    """
+    LiteLlm keyword arguments that keep an Ollama model and its KV cache loaded
+    between turns. Ollama reuses the cached prefix when a prompt starts with
+    the same tokens, so the static system prompt is only prefilled once;
+    OLLAMA_NUM_CTX must be large enough to hold it plus the conversation.
+    """
+    options: Dict[str, Any] = {"keep_alive": getenv("OLLAMA_KEEP_ALIVE", "30m")}
+    num_ctx = getenv("OLLAMA_NUM_CTX")
+    if num_ctx:
+        options["num_ctx"] = int(num_ctx)
+    return options
+
+
+def gemini_context_cache_config() -> Any:
+    """
+    ContextCacheConfig for an ADK App: Gemini caches the static instruction
+    and tools once they reach `min_tokens` and reuses them for `ttl_seconds`
+    or `cache_intervals` invocations.
+    """
+    from google.adk.agents.context_cache_config import ContextCacheConfig
+
+    return ContextCacheConfig(
+        min_tokens=int(getenv("GEMINI_CACHE_MIN_TOKENS", "2048")),
+        ttl_seconds=int(getenv("GEMINI_CACHE_TTL", "1800")),
+        cache_intervals=int(getenv("GEMINI_CACHE_INTERVALS", "10")),
+    )
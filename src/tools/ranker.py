@@ -0,0 +1,90 @@
+import re
+from typing import Dict, List, Sequence
+
+import numpy as np
+from scipy import sparse
+
+TOKEN_RE = re.compile(r"\w+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from how in is it of on or that the this to was what when where which who why with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Ranker:
+    """
+    Okapi BM25 over an in-memory corpus, computed with sparse matrices.
+
+    The corpus is turned into a (documents x vocabulary) matrix of BM25 term
+    weights once; scoring a batch of queries is then a single sparse product.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocabulary: Dict[str, int] = {}
+        self._weights = sparse.csr_matrix((0, 0))
+
+    def fit(self, documents: Sequence[str]) -> "BM25Ranker":
+        rows, cols = [], []
+        lengths = np.zeros(len(documents), dtype=np.float64)
+        for row, document in enumerate(documents):
+            tokens = tokenize(document)
+            lengths[row] = len(tokens)
+            for token in tokens:
+                rows.append(row)
+                cols.append(self.vocabulary.setdefault(token, len(self.vocabulary)))
+
+        shape = (len(documents), len(self.vocabulary))
+        tf = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=shape)
+        tf.sum_duplicates()
+
+        n_docs = max(len(documents), 1)
+        df = np.bincount(tf.indices, minlength=shape[1])
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+
+        avgdl = lengths.mean() if len(documents) else 0.0
+        norm = self.k1 * (1 - self.b + self.b * lengths / (avgdl or 1.0))
+        # Each stored tf value is rescaled by its own row's length normalization
+        row_norm = np.repeat(norm, np.diff(tf.indptr))
+        tf.data = tf.data * (self.k1 + 1) / (tf.data + row_norm) * idf[tf.indices]
+        self._weights = tf
+        return self
+
+    def score(self, queries: Sequence[str]) -> np.ndarray:
+        """Scores of every document for every query, shape (queries, documents)"""
+        rows, cols = [], []
+        for row, query in enumerate(queries):
+            for token in set(tokenize(query)):
+                col = self.vocabulary.get(token)
+                if col is not None:
+                    rows.append(row)
+                    cols.append(col)
+        query_matrix = sparse.csr_matrix(
+            (np.ones(len(rows)), (rows, cols)), shape=(len(queries), len(self.vocabulary))
+        )
+        return (query_matrix @ self._weights.T).toarray()
+
+    @staticmethod
+    def top_k(scores: np.ndarray, k: int) -> List[List[int]]:
+        """
+        Indices of the k best documents per query, best first. Zero scores are
+        kept, and ties (an all-zero row included) are broken by position, so a
+        query with no matching terms still gets its first k documents.
+        """
+        if scores.shape[1] == 0 or k <= 0:
+            return [[] for _ in range(scores.shape[0])]
+        k = min(k, scores.shape[1])
+        # k-th best score per row; everything above it is in, ties fill the rest in document order
+        kth = -np.partition(-scores, k - 1, axis=1)[:, k - 1]
+        result = []
+        for row, cut in enumerate(kth):
+            above = np.flatnonzero(scores[row] > cut)
+            tied = np.flatnonzero(scores[row] == cut)[: k - len(above)]
+            indices = np.concatenate([above, tied])
+            ordered = indices[np.argsort(-scores[row, indices], kind="stable")]
+            result.append([int(i) for i in ordered])
+        return result
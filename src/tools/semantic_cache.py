@@ -0,0 +1,202 @@
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from os import getenv
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from tools.ranker import STOPWORDS, TOKEN_RE
+
+DEFAULT_QUESTION_CACHE_PATH = Path.home() / ".cache" / "deepresearch" / "question_cache.sqlite"
+
+# The ranker drops wh-words as stopwords, but "how X works" and "why X works" need different plans
+QUESTION_WORDS = frozenset("how what when where which who whom whose why".split())
+QUESTION_STOPWORDS = STOPWORDS - QUESTION_WORDS
+
+
+def question_tokens(text: str) -> List[str]:
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in QUESTION_STOPWORDS]
+
+
+def question_vector(text: str, dim: int = 4096) -> np.ndarray:
+    """
+    L2-normalized hashed n-gram vector of a question.
+
+    Word unigrams and bigrams capture the content, character trigrams make
+    inflections ("model" / "models") and typos land close to each other.
+    Features are hashed into `dim` buckets with a sign bit, so no vocabulary
+    or model has to be kept around. Question words are kept as features.
+    """
+    tokens = question_tokens(text)
+    joined = " ".join(tokens)
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    features += [f"#{joined[i:i + 3]}" for i in range(len(joined) - 2)]
+
+    vector = np.zeros(dim, dtype=np.float32)
+    for feature in features:
+        digest = zlib.crc32(feature.encode("utf-8"))
+        vector[digest % dim] += -1.0 if digest & 0x80000000 else 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class QuestionCache:
+    """
+    Similarity cache from research questions to their sub-question decomposition.
+
+    Every stored question keeps its `question_vector` in SQLite and in an
+    in-memory matrix; a lookup is one brute-force matrix-vector product and
+    hits when the best cosine similarity reaches `threshold`. Entries expire
+    after `ttl` seconds so questions about "recent" work get re-planned.
+    """
+
+    _default: "QuestionCache | None" = None
+
+    def __init__(
+        self,
+        path: Path | str = DEFAULT_QUESTION_CACHE_PATH,
+        threshold: float = 0.9,
+        ttl: Optional[float] = 7 * 24 * 3600,
+        dim: int = 4096,
+    ):
+        self.path = Path(path)
+        self.threshold = threshold
+        self.ttl = ttl
+        self.dim = dim
+        self.hits = 0
+        self.misses = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[str, str], str] = {}
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS questions (
+                id INTEGER PRIMARY KEY,
+                question TEXT UNIQUE NOT NULL,
+                vector BLOB NOT NULL,
+                sub_questions TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+        self._load()
+
+    @classmethod
+    def default(cls) -> "QuestionCache":
+        if cls._default is None:
+            cls._default = cls(
+                getenv("SEMANTIC_CACHE_PATH", str(DEFAULT_QUESTION_CACHE_PATH)),
+                threshold=float(getenv("SEMANTIC_CACHE_THRESHOLD", "0.9")),
+            )
+        return cls._default
+
+    def lookup(self, question: str) -> Optional[List[Dict[str, str]]]:
+        """Sub-questions (`{"id", "text"}` dicts) of the most similar cached question, if similar enough"""
+        with self._lock:
+            if self.ttl is not None:
+                self._expire()
+            if not self._ids:
+                self.misses += 1
+                return None
+            similarities = self._matrix @ question_vector(question, self.dim)
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+            row = self._conn.execute(
+                "SELECT sub_questions FROM questions WHERE id = ?", (self._ids[best],)
+            ).fetchone()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def store(self, question: str, sub_questions: List[Dict[str, str]]) -> None:
+        if not sub_questions:
+            return
+        vector = question_vector(question, self.dim)
+        with self._lock:
+            self._conn.execute("DELETE FROM questions WHERE question = ?", (question,))
+            self._conn.execute(
+                "INSERT INTO questions (question, vector, sub_questions, created_at) VALUES (?, ?, ?, ?)",
+                (question, vector.tobytes(), json.dumps(sub_questions), time.time()),
+            )
+            self._conn.commit()
+            self._load()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._ids),
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM questions")
+            self._conn.commit()
+            self._load()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def before_model(self, callback_context: Any, llm_request: Any) -> Any:
+        """ADK before_model_callback for the planner: answers from the cache without calling the model"""
+        # Imported here so the langgraph pipeline can use the cache without ADK installed
+        from google.adk.models import LlmResponse
+        from google.genai import types as genai_types
+
+        question = callback_context.state.get("research_question_text")
+        if not question:
+            return None
+        cached = self.lookup(question)
+        if cached is None:
+            self._pending[(callback_context.invocation_id, callback_context.agent_name)] = question
+            return None
+        text = json.dumps({"sub_questions": cached})
+        return LlmResponse(content=genai_types.Content(role="model", parts=[genai_types.Part(text=text)]))
+
+    def after_model(self, callback_context: Any, llm_response: Any) -> Any:
+        """ADK after_model_callback for the planner: remembers the decomposition of a new question"""
+        if llm_response.partial:
+            return None
+        question = self._pending.pop((callback_context.invocation_id, callback_context.agent_name), None)
+        if question is None or llm_response.content is None or llm_response.error_code:
+            return None
+        text = "".join(part.text or "" for part in llm_response.content.parts or [])
+        try:
+            sub_questions = json.loads(text)["sub_questions"]
+        except (ValueError, KeyError, TypeError):
+            return None
+        self.store(question, sub_questions)
+        return None
+
+    def on_model_error(self, callback_context: Any, llm_request: Any, error: Exception) -> Any:
+        """ADK on_model_error_callback: the planner call failed, nothing to remember"""
+        self._pending.pop((callback_context.invocation_id, callback_context.agent_name), None)
+        return None
+
+    def _load(self) -> None:
+        rows = self._conn.execute("SELECT id, vector FROM questions ORDER BY id").fetchall()
+        self._ids = [row[0] for row in rows]
+        self._matrix = (
+            np.stack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+            if rows
+            else np.zeros((0, self.dim), dtype=np.float32)
+        )
+
+    def _expire(self) -> None:
+        deleted = self._conn.execute(
+            "DELETE FROM questions WHERE created_at < ?", (time.time() - self.ttl,)
+        ).rowcount
+        if deleted:
+            self._conn.commit()
+            self._load()
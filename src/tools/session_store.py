@@ -0,0 +1,338 @@
+import json
+import time
+import uuid
+from pathlib import Path
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
+
+import aiosqlite
+from typing_extensions import override
+
+from google.adk.agents import SequentialAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event, EventActions
+from google.adk.sessions import BaseSessionService, Session, State
+from google.adk.sessions.base_session_service import GetSessionConfig, ListSessionsResponse
+
+DEFAULT_SESSION_PATH = Path.home() / ".cache" / "deepresearch" / "sessions.sqlite"
+
+# Names of the sub-agents a ResumableSequentialAgent has already finished
+COMPLETED_STEPS_KEY = "pipeline:completed_steps"
+
+SessionKey = Tuple[str, str, str]
+
+
+def _split_state(state: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]:
+    """Separates a state delta into app-, user- and session-scoped parts; temp: keys are dropped"""
+    app, user, session = {}, {}, {}
+    for key, value in state.items():
+        if key.startswith(State.APP_PREFIX):
+            app[key[len(State.APP_PREFIX):]] = value
+        elif key.startswith(State.USER_PREFIX):
+            user[key[len(State.USER_PREFIX):]] = value
+        elif not key.startswith(State.TEMP_PREFIX):
+            session[key] = value
+    return app, user, session
+
+
+def _merge_state(app: Dict[str, Any], user: Dict[str, Any], session: Dict[str, Any]) -> Dict[str, Any]:
+    merged = dict(session)
+    merged.update({State.APP_PREFIX + key: value for key, value in app.items()})
+    merged.update({State.USER_PREFIX + key: value for key, value in user.items()})
+    return merged
+
+
+class SqliteSessionService(BaseSessionService):
+    """
+    Durable ADK session service on a single SQLite file (WAL mode, aiosqlite).
+
+    Events and state deltas are applied to the in-memory session right away
+    but written in batches: a flush happens every `batch_size` events, when an
+    event marks a pipeline step as completed, and on `flush()` / `close()`.
+    Step checkpoints are therefore always on disk, and a crashed run loses at
+    most the events of the step that was in progress.
+    """
+
+    def __init__(self, path: Path | str = DEFAULT_SESSION_PATH, batch_size: int = 32):
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self._conn: Optional[aiosqlite.Connection] = None
+        self._pending_events: List[Tuple[SessionKey, Event]] = []
+        self._pending_sessions: Dict[SessionKey, Session] = {}
+        self._pending_app: Dict[str, Dict[str, Any]] = {}
+        self._pending_user: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+    async def _connection(self) -> aiosqlite.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = await aiosqlite.connect(self.path)
+            await self._conn.execute("PRAGMA journal_mode=WAL")
+            await self._conn.execute("PRAGMA synchronous=NORMAL")
+            await self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS sessions (
+                    app_name TEXT NOT NULL,
+                    user_id TEXT NOT NULL,
+                    id TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    update_time REAL NOT NULL,
+                    PRIMARY KEY (app_name, user_id, id)
+                );
+                CREATE TABLE IF NOT EXISTS events (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    app_name TEXT NOT NULL,
+                    user_id TEXT NOT NULL,
+                    session_id TEXT NOT NULL,
+                    timestamp REAL NOT NULL,
+                    body TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS events_session ON events (app_name, user_id, session_id, seq);
+                CREATE TABLE IF NOT EXISTS app_states (
+                    app_name TEXT PRIMARY KEY,
+                    state TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS user_states (
+                    app_name TEXT NOT NULL,
+                    user_id TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    PRIMARY KEY (app_name, user_id)
+                );
+                """
+            )
+            await self._conn.commit()
+        return self._conn
+
+    @override
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[Dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        session_id = session_id.strip() if session_id and session_id.strip() else str(uuid.uuid4())
+        app_delta, user_delta, session_state = _split_state(state or {})
+        self._pending_app.setdefault(app_name, {}).update(app_delta)
+        self._pending_user.setdefault((app_name, user_id), {}).update(user_delta)
+        await self.flush()
+
+        conn = await self._connection()
+        now = time.time()
+        try:
+            await conn.execute(
+                "INSERT INTO sessions (app_name, user_id, id, state, update_time) VALUES (?, ?, ?, ?, ?)",
+                (app_name, user_id, session_id, json.dumps(session_state), now),
+            )
+        except aiosqlite.IntegrityError:
+            raise ValueError(f"Session {session_id} already exists") from None
+        await conn.commit()
+
+        app_state, user_state = await self._scoped_states(app_name, user_id)
+        return Session(
+            app_name=app_name,
+            user_id=user_id,
+            id=session_id,
+            state=_merge_state(app_state, user_state, session_state),
+            last_update_time=now,
+        )
+
+    @override
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        await self.flush()
+        conn = await self._connection()
+        row = await (
+            await conn.execute(
+                "SELECT state, update_time FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?",
+                (app_name, user_id, session_id),
+            )
+        ).fetchone()
+        if row is None:
+            return None
+
+        query = "SELECT body FROM events WHERE app_name = ? AND user_id = ? AND session_id = ?"
+        params: List[Any] = [app_name, user_id, session_id]
+        if config and config.after_timestamp:
+            query += " AND timestamp >= ?"
+            params.append(config.after_timestamp)
+        query += " ORDER BY seq"
+        events = [Event.model_validate_json(body) for (body,) in await (await conn.execute(query, params)).fetchall()]
+        if config and config.num_recent_events:
+            events = events[-config.num_recent_events:]
+
+        app_state, user_state = await self._scoped_states(app_name, user_id)
+        return Session(
+            app_name=app_name,
+            user_id=user_id,
+            id=session_id,
+            state=_merge_state(app_state, user_state, json.loads(row[0])),
+            events=events,
+            last_update_time=row[1],
+        )
+
+    @override
+    async def list_sessions(self, *, app_name: str, user_id: Optional[str] = None) -> ListSessionsResponse:
+        await self.flush()
+        conn = await self._connection()
+        query = "SELECT user_id, id, state, update_time FROM sessions WHERE app_name = ?"
+        params: List[Any] = [app_name]
+        if user_id is not None:
+            query += " AND user_id = ?"
+            params.append(user_id)
+        sessions = []
+        for row_user, session_id, state, update_time in await (await conn.execute(query, params)).fetchall():
+            app_state, user_state = await self._scoped_states(app_name, row_user)
+            sessions.append(
+                Session(
+                    app_name=app_name,
+                    user_id=row_user,
+                    id=session_id,
+                    state=_merge_state(app_state, user_state, json.loads(state)),
+                    last_update_time=update_time,
+                )
+            )
+        return ListSessionsResponse(sessions=sessions)
+
+    @override
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        key = (app_name, user_id, session_id)
+        self._pending_events = [(pending, event) for pending, event in self._pending_events if pending != key]
+        self._pending_sessions.pop(key, None)
+        conn = await self._connection()
+        await conn.execute(
+            "DELETE FROM events WHERE app_name = ? AND user_id = ? AND session_id = ?", key
+        )
+        await conn.execute("DELETE FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?", key)
+        await conn.commit()
+
+    @override
+    async def append_event(self, session: Session, event: Event) -> Event:
+        event = await super().append_event(session, event)
+        if event.partial:
+            return event
+
+        key = (session.app_name, session.user_id, session.id)
+        session.last_update_time = event.timestamp
+        self._pending_events.append((key, event))
+        self._pending_sessions[key] = session
+        delta = event.actions.state_delta if event.actions else None
+        if delta:
+            app_delta, user_delta, _ = _split_state(delta)
+            self._pending_app.setdefault(session.app_name, {}).update(app_delta)
+            self._pending_user.setdefault((session.app_name, session.user_id), {}).update(user_delta)
+
+        if len(self._pending_events) >= self.batch_size or (delta and COMPLETED_STEPS_KEY in delta):
+            await self.flush()
+        return event
+
+    async def flush(self) -> None:
+        """Writes every buffered event and state change in one transaction"""
+        if not (self._pending_events or self._pending_sessions or self._pending_app or self._pending_user):
+            return
+        events, self._pending_events = self._pending_events, []
+        sessions, self._pending_sessions = self._pending_sessions, {}
+        app_deltas, self._pending_app = self._pending_app, {}
+        user_deltas, self._pending_user = self._pending_user, {}
+
+        conn = await self._connection()
+        await conn.executemany(
+            "INSERT INTO events (app_name, user_id, session_id, timestamp, body) VALUES (?, ?, ?, ?, ?)",
+            [(*key, event.timestamp, event.model_dump_json(exclude_none=True)) for key, event in events],
+        )
+        await conn.executemany(
+            "UPDATE sessions SET state = ?, update_time = ? WHERE app_name = ? AND user_id = ? AND id = ?",
+            [
+                (json.dumps(_split_state(session.state)[2]), session.last_update_time, *key)
+                for key, session in sessions.items()
+            ],
+        )
+        for app_name, delta in app_deltas.items():
+            if delta:
+                await self._merge_scoped(
+                    "SELECT state FROM app_states WHERE app_name = ?",
+                    "INSERT OR REPLACE INTO app_states (app_name, state) VALUES (?, ?)",
+                    (app_name,),
+                    delta,
+                )
+        for (app_name, user_id), delta in user_deltas.items():
+            if delta:
+                await self._merge_scoped(
+                    "SELECT state FROM user_states WHERE app_name = ? AND user_id = ?",
+                    "INSERT OR REPLACE INTO user_states (app_name, user_id, state) VALUES (?, ?, ?)",
+                    (app_name, user_id),
+                    delta,
+                )
+        await conn.commit()
+
+    async def close(self) -> None:
+        await self.flush()
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+    async def _scoped_states(self, app_name: str, user_id: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        conn = await self._connection()
+        app_row = await (
+            await conn.execute("SELECT state FROM app_states WHERE app_name = ?", (app_name,))
+        ).fetchone()
+        user_row = await (
+            await conn.execute(
+                "SELECT state FROM user_states WHERE app_name = ? AND user_id = ?", (app_name, user_id)
+            )
+        ).fetchone()
+        return (json.loads(app_row[0]) if app_row else {}), (json.loads(user_row[0]) if user_row else {})
+
+    async def _merge_scoped(self, select: str, upsert: str, key: Tuple[str, ...], delta: Dict[str, Any]) -> None:
+        conn = await self._connection()
+        row = await (await conn.execute(select, key)).fetchone()
+        state = json.loads(row[0]) if row else {}
+        state.update(delta)
+        await conn.execute(upsert, (*key, json.dumps(state)))
+
+
+class ResumableSequentialAgent(SequentialAgent):
+    """
+    SequentialAgent that checkpoints each finished sub-agent in session state.
+
+    After a sub-agent ends, an event records its name under
+    `pipeline:completed_steps`; on a later run with the same session those
+    sub-agents are skipped, so a crashed pipeline resumes from the first step
+    that did not finish instead of repeating the expensive LLM calls.
+    """
+
+    @override
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        completed = list(ctx.session.state.get(COMPLETED_STEPS_KEY, []))
+        for sub_agent in self.sub_agents:
+            if sub_agent.name in completed:
+                continue
+            async for event in sub_agent.run_async(ctx):
+                yield event
+            completed.append(sub_agent.name)
+            yield Event(
+                invocation_id=ctx.invocation_id,
+                author=self.name,
+                branch=ctx.branch,
+                actions=EventActions(state_delta={COMPLETED_STEPS_KEY: list(completed)}),
+            )
+
+
+async def resume_or_create_session(
+    service: BaseSessionService,
+    *,
+    app_name: str,
+    user_id: str,
+    session_id: str,
+    state: Optional[Dict[str, Any]] = None,
+) -> Session:
+    """Existing session with its checkpoints if there is one, a fresh one otherwise"""
+    session = await service.get_session(app_name=app_name, user_id=user_id, session_id=session_id)
+    if session is not None:
+        return session
+    return await service.create_session(app_name=app_name, user_id=user_id, state=state, session_id=session_id)
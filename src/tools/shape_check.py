@@ -0,0 +1,266 @@
+import re
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from tools.blueprint import Blueprint
+
+Dim = Union[int, str]
+Shape = List[Dim]
+
+# A size, possibly written as a product: "3136", "64*7*7", "28 × 28"
+SIZE = r"\d+(?:\s*[*×]\s*\d+)*"
+SIZE_RE = re.compile(SIZE)
+IN_OUT_RE = re.compile(rf"({SIZE})\s*(?:->|→|=>|\bto\b|,)\s*({SIZE})")
+KERNEL_RE = re.compile(r"\b(?:k|kernel|kernel_size)\s*[=:]?\s*\(?(\d+)")
+# "3x3 kernel", "Conv2d(3->16, 5×5)"; the two sizes may differ ("1x7")
+KXK_RE = re.compile(r"\b(\d+)\s*[x×]\s*(\d+)\b")
+STRIDE_RE = re.compile(r"\b(?:s|stride)\s*[=:]\s*\(?(\d+)")
+PADDING_RE = re.compile(r"\b(?:p|pad|padding)\s*[=:]\s*\(?(\d+|same)")
+DILATION_RE = re.compile(r"\b(?:d|dilation)\s*[=:]\s*\(?(\d+)")
+HEADS_RE = re.compile(r"(?:\b(?:heads|num_heads|nhead)\s*[=:]?\s*(\d+))|(?:(\d+)\s*heads?\b)")
+EMBED_RE = re.compile(r"\b(?:embed_dim|embed|d_model|dim|hidden)\s*[=:]\s*(\d+)")
+IN_FEATURES_RE = re.compile(r"\bin_features\s*[=:]\s*(\d+)")
+# A linear layer given only its width: "Dense(128, activation='softmax')", "units=64", "256 units"
+OUT_FEATURES_RE = re.compile(r"\b(?:units|out_features)\s*[=:]\s*(\d+)|\(\s*(\d+)\s*[,)]|\b(\d+)\s*(?:units|neurons)\b")
+
+# Layers that never change the shape of their input
+SHAPE_PRESERVING = (
+    "relu", "gelu", "silu", "elu", "tanh", "sigmoid", "softmax", "swish", "mish", "activation",
+    "dropout", "norm", "identity", "residual", "skip", "positional",
+)
+
+
+def parse_shape(text: str) -> Shape:
+    """'[Batch, 3, 224, 224]' -> ['Batch', 3, 224, 224]; named sizes like 'Seq_Len=128' keep their number"""
+    dims: Shape = []
+    for token in text.strip().strip("[]()").split(","):
+        token = token.strip()
+        if not token:
+            continue
+        sizes = SIZE_RE.findall(token)
+        dims.append(_size(sizes[-1]) if sizes else token)
+    return dims
+
+
+def _size(text: str) -> int:
+    """Value of a SIZE match: "64*7*7" -> 3136"""
+    product = 1
+    for factor in re.split(r"[*×]", text):
+        product *= int(factor)
+    return product
+
+
+def _in_out(text: str) -> Optional[Tuple[int, int]]:
+    match = IN_OUT_RE.search(text)
+    return (_size(match.group(1)), _size(match.group(2))) if match else None
+
+
+def _kernel(text: str, dims: int) -> Optional[List[int]]:
+    """Kernel size per spatial dimension, None if the description does not give one"""
+    match = KXK_RE.search(text)
+    if match:
+        sizes = [int(match.group(1)), int(match.group(2))]
+        return sizes[-dims:] if dims < 2 else sizes
+    size = _param(KERNEL_RE, text)
+    return None if size is None else [size] * dims
+
+
+def format_shape(shape: Shape) -> str:
+    return "[" + ", ".join(str(dim) for dim in shape) + "]"
+
+
+def _param(pattern: re.Pattern, text: str, default: Optional[int] = None) -> Optional[int]:
+    match = pattern.search(text)
+    return int(match.group(1)) if match else default
+
+
+def _spatial(size: Dim, kernel: int, stride: int, padding: int, dilation: int = 1) -> Dim:
+    if not isinstance(size, int):
+        return f"{size}'"
+    return (size + 2 * padding - dilation * (kernel - 1) - 1) // stride + 1
+
+
+class ShapeError(ValueError):
+    pass
+
+
+def _apply(layer: str, shape: Shape) -> Optional[Shape]:
+    """Output shape of one layer description, None if the layer is not understood"""
+    text = layer.lower()
+    if ":" in text and text.split(":", 1)[0].strip().startswith("layer"):
+        text = text.split(":", 1)[1]
+
+    def expect(dim: Dim, value: int, what: str) -> None:
+        if isinstance(dim, int) and dim != value:
+            raise ShapeError(f"{what} expects {value} but the input has {dim} (input {format_shape(shape)})")
+
+    if "positional" in text:
+        return list(shape)
+
+    if "transpose" in text or "deconv" in text or "upsampl" in text:
+        return None
+
+    if "conv" in text:
+        spatial_dims = 1 if "1d" in text else 2
+        if len(shape) != spatial_dims + 2:
+            raise ShapeError(f"expects a rank-{spatial_dims + 2} input, got {format_shape(shape)}")
+        in_out = _in_out(text)
+        kernel = _kernel(text, spatial_dims)
+        if not in_out or kernel is None:
+            # Without channels or kernel size the output cannot be known; PyTorch has no default kernel
+            return None
+        expect(shape[1], in_out[0], "in_channels")
+        stride = _param(STRIDE_RE, text, 1)
+        dilation = _param(DILATION_RE, text, 1)
+        padding_match = PADDING_RE.search(text)
+        if padding_match and padding_match.group(1) == "same":
+            return [shape[0], in_out[1], *shape[2:]]
+        padding = int(padding_match.group(1)) if padding_match else 0
+        return [shape[0], in_out[1]] + [
+            _spatial(size, k, stride, padding, dilation) for size, k in zip(shape[2:], kernel)
+        ]
+
+    if "pool" in text:
+        if len(shape) < 3:
+            raise ShapeError(f"pooling needs spatial dimensions, got {format_shape(shape)}")
+        if "adaptive" in text:
+            size = _param(re.compile(r"(\d+)"), text.split("adaptive", 1)[1].replace("1d", "").replace("2d", ""), 1)
+            return [shape[0], shape[1]] + [size] * (len(shape) - 2)
+        if "global" in text:
+            return [shape[0], shape[1]]
+        kernel = _kernel(text, len(shape) - 2)
+        if kernel is None:
+            # "MaxPool2d(2)" / "MaxPool2d 2": a lone number is the kernel size
+            size = _param(re.compile(r"(\d+)"), text.replace("1d", "").replace("2d", ""))
+            if size is None:
+                return None
+            kernel = [size] * (len(shape) - 2)
+        stride = _param(STRIDE_RE, text)
+        padding_match = PADDING_RE.search(text)
+        padding = int(padding_match.group(1)) if padding_match and padding_match.group(1) != "same" else 0
+        return [shape[0], shape[1]] + [
+            _spatial(size, k, k if stride is None else stride, padding) for size, k in zip(shape[2:], kernel)
+        ]
+
+    if "flatten" in text:
+        rest = shape[1:]
+        if all(isinstance(dim, int) for dim in rest):
+            product = 1
+            for dim in rest:
+                product *= dim
+            return [shape[0], product]
+        return [shape[0], "*".join(str(dim) for dim in rest)]
+
+    is_linear = any(word in text for word in ("linear", "dense", "fully connected")) or text.strip().startswith("fc")
+    if is_linear:
+        in_out = _in_out(text)
+        if in_out:
+            expect(shape[-1], in_out[0], "in_features")
+            return [*shape[:-1], in_out[1]]
+        match = OUT_FEATURES_RE.search(text)
+        if not match:
+            # A linear layer of unknown width changes the last dimension; never treat it as shape-preserving
+            return None
+        in_features = _param(IN_FEATURES_RE, text)
+        if in_features is not None:
+            expect(shape[-1], in_features, "in_features")
+        return [*shape[:-1], int(next(group for group in match.groups() if group))]
+
+    if "embedding" in text:
+        in_out = _in_out(text)
+        if not in_out:
+            return None
+        return [*shape, in_out[1]]
+
+    if any(word in text for word in ("lstm", "gru", "rnn")):
+        if len(shape) != 3:
+            raise ShapeError(f"recurrent layers expect [Batch, Seq_Len, Features], got {format_shape(shape)}")
+        in_out = _in_out(text)
+        if not in_out:
+            return None
+        expect(shape[-1], in_out[0], "input_size")
+        hidden = in_out[1] * (2 if "bidirectional" in text else 1)
+        if any(word in text for word in ("last", "final", "hidden state")):
+            return [shape[0], hidden]
+        return [shape[0], shape[1], hidden]
+
+    if "attention" in text or "transformer" in text:
+        embed = _param(EMBED_RE, text)
+        if embed is None and (in_out := _in_out(text)):
+            embed = in_out[0]
+        heads_match = HEADS_RE.search(text)
+        heads = int(heads_match.group(1) or heads_match.group(2)) if heads_match else None
+        if embed is not None:
+            expect(shape[-1], embed, "embed_dim")
+        dim = shape[-1]
+        if heads and isinstance(dim, int) and dim % heads:
+            raise ShapeError(f"embed_dim {dim} is not divisible by {heads} heads")
+        return list(shape)
+
+    if any(word in text for word in SHAPE_PRESERVING):
+        if "batchnorm" in text.replace(" ", "") and (channels := _param(re.compile(r"\((\d+)"), text)):
+            expect(shape[1], channels, "num_features")
+        return list(shape)
+    return None
+
+
+def check_shapes(blueprint: Union[Blueprint, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Propagate the blueprint's input shape through its layer_structure and
+    compare the result with its output_shape.
+
+    Layers are read from their text (Conv1d/Conv2d, pooling, Flatten, Linear/Dense,
+    Embedding, LSTM/GRU, attention/transformer, and shape-preserving layers
+    such as activations, norms and dropout). Symbolic sizes (Batch, Seq_Len)
+    are carried through unchecked. A layer that cannot be parsed stops the
+    propagation with a warning rather than guessing.
+    """
+    if not isinstance(blueprint, Blueprint):
+        blueprint = Blueprint.model_validate(blueprint)
+
+    shape = parse_shape(blueprint.data_spec.input_shape)
+    expected = parse_shape(blueprint.data_spec.output_shape)
+    errors: List[str] = []
+    warnings: List[str] = []
+    trace = [{"layer": "input", "shape": format_shape(shape)}]
+
+    for layer in blueprint.architecture_design.layer_structure:
+        try:
+            output = _apply(layer, shape)
+        except ShapeError as exc:
+            errors.append(f"{layer}: {exc}")
+            break
+        if output is None:
+            warnings.append(f"{layer}: could not infer the output shape, later layers were not checked")
+            break
+        shape = output
+        trace.append({"layer": layer, "shape": format_shape(shape)})
+    else:
+        if len(shape) != len(expected):
+            errors.append(f"final shape {format_shape(shape)} does not match output_shape {format_shape(expected)}")
+        else:
+            for got, want in zip(shape, expected):
+                if isinstance(got, int) and isinstance(want, int) and got != want:
+                    errors.append(
+                        f"final shape {format_shape(shape)} does not match output_shape {format_shape(expected)}"
+                    )
+                    break
+
+    return {"ok": not errors, "errors": errors, "warnings": warnings, "trace": trace}
+
+
+def check_blueprint_shapes(blueprint: dict) -> dict:
+    """
+    Checks the tensor shapes of a technical blueprint without running any code.
+
+    Args:
+        blueprint: The blueprint JSON (project_name, task_type, design_rationale,
+            data_spec, architecture_design, training_config).
+
+    Returns:
+        dict with "ok", the "errors" found (dimension mismatches), "warnings"
+        (layers that could not be parsed) and the shape after every layer in "trace".
+    """
+    try:
+        return check_shapes(blueprint)
+    except ValueError as exc:
+        return {"ok": False, "errors": [f"invalid blueprint: {exc}"], "warnings": [], "trace": []}
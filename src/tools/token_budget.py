@@ -0,0 +1,86 @@
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from tools.dedup import approx_tokens
+
+DEFAULT_ENCODING = "cl100k_base"
+
+
+@lru_cache(maxsize=None)
+def _encoder(encoding: str) -> Any:
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.get_encoding(encoding)
+    except Exception:
+        # The encoding file could not be loaded (e.g. offline first run)
+        return None
+
+
+def count_tokens(text: str, encoding: str = DEFAULT_ENCODING) -> int:
+    """Tokens of text with tiktoken, or the ~4 characters per token estimate if it is unavailable"""
+    encoder = _encoder(encoding)
+    if encoder is None:
+        return approx_tokens(text)
+    return len(encoder.encode(text, disallowed_special=()))
+
+
+class TokenBudget:
+    """
+    Packs the highest-scoring passages into a token budget per question.
+
+    For every question, passages are taken in descending score order and kept
+    while they fit in `per_question` tokens; one that does not fit is skipped
+    so smaller, lower-ranked passages can still fill the rest. A passage chosen
+    by several questions counts against each of their budgets but only once
+    against the optional `total` budget of the whole prompt.
+    """
+
+    def __init__(
+        self,
+        per_question: int = 2000,
+        total: Optional[int] = None,
+        counter: Callable[[str], int] = count_tokens,
+    ):
+        self.per_question = per_question
+        self.total = total
+        self.counter = counter
+
+    def pack(self, scores: np.ndarray, texts: Sequence[str]) -> Dict[str, Any]:
+        """
+        Select passages given their (questions x passages) scores. Returns the
+        selected indices (best score first), their token count and the tokens
+        used by each question.
+        """
+        tokens = [self.counter(text) for text in texts]
+        selected: Dict[int, float] = {}
+        used_total = 0
+        per_question: List[int] = []
+        for row in scores:
+            used = 0
+            for i in np.argsort(-row, kind="stable"):
+                if row[i] <= 0:
+                    break
+                i = int(i)
+                if used + tokens[i] > self.per_question:
+                    continue
+                if i not in selected:
+                    if self.total is not None and used_total + tokens[i] > self.total:
+                        continue
+                    selected[i] = float(row[i])
+                    used_total += tokens[i]
+                else:
+                    selected[i] = max(selected[i], float(row[i]))
+                used += tokens[i]
+            per_question.append(used)
+
+        return {
+            "selected": sorted(selected, key=lambda i: -selected[i]),
+            "tokens": used_total,
+            "tokens_per_question": per_question,
+            "candidate_tokens": sum(tokens),
+        }